@@ -11,14 +11,23 @@ from flask_smorest import Api
 
 import os
 
-from models import FileModel, IconsModel
-from models.blocked_tokens import BlockedTokenModel
 from resources import UserBlueprint, ImageBlueprint, TagBlueprint, PostBlueprint, LocationBlueprint, IconBlueprint, CommentBlueprint, ReportBlueprint, NotificationBlueprint
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 
+from assets import asset_server
+from blocklist import token_blocklist
+from bootstrap import bootstrap, bootstrap_command, reconcile_tag_counts_command, schema_is_current
 from db import db
-from mail import mail
+from generations import change_tracker
+from google_tokens import google_tokens
+from http_client import http_client
+from image_jobs import avatar_pipeline
+from location_cache import location_cache
+from mail import mail, mail_queue
+from passwords import password_hasher
+from reference_data import reference_data
+from tag_index import tag_index
 import models
 
 load_dotenv('.flaskenv')
@@ -36,15 +45,53 @@ def create_app(db_url=None):
     app.config["SQLALCHEMY_DATABASE_URI"] = db_url or os.getenv("DATABASE_URL", "sqlite:///seegest.db")
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "super-secret")
+    app.config["BCRYPT_LOG_ROUNDS"] = int(os.getenv("BCRYPT_LOG_ROUNDS", "12"))
+    app.config["BCRYPT_WORKERS"] = int(os.getenv("BCRYPT_WORKERS", "0")) or None
+    app.config["BCRYPT_MAX_QUEUE"] = int(os.getenv("BCRYPT_MAX_QUEUE", "16"))
+    app.config["HTTP_POOL_SIZE"] = int(os.getenv("HTTP_POOL_SIZE", "10"))
+    app.config["HTTP_CONNECT_TIMEOUT"] = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+    app.config["HTTP_READ_TIMEOUT"] = float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+    app.config["HTTP_RETRIES"] = int(os.getenv("HTTP_RETRIES", "2"))
+    app.config["HTTP_BREAKER_THRESHOLD"] = int(os.getenv("HTTP_BREAKER_THRESHOLD", "5"))
+    app.config["HTTP_BREAKER_RESET"] = int(os.getenv("HTTP_BREAKER_RESET", "30"))
+    app.config["GOOGLE_CERTS_DEFAULT_TTL"] = int(os.getenv("GOOGLE_CERTS_DEFAULT_TTL", "300"))
+    app.config["GOOGLE_CERTS_MIN_REFRESH"] = int(os.getenv("GOOGLE_CERTS_MIN_REFRESH", "30"))
+    app.config["GOOGLE_TOKEN_MEMO_TTL"] = int(os.getenv("GOOGLE_TOKEN_MEMO_TTL", "60"))
+    app.config["FAST_SERIALIZERS"] = os.getenv("FAST_SERIALIZERS", "1") == "1"
+    app.config["AVATAR_WORKERS"] = int(os.getenv("AVATAR_WORKERS", "2"))
+    app.config["AVATAR_MAX_BYTES"] = int(os.getenv("AVATAR_MAX_BYTES", str(10 * 1024 * 1024)))
+    app.config["AVATAR_SPOOL_BYTES"] = int(os.getenv("AVATAR_SPOOL_BYTES", str(1024 * 1024)))
+    app.config["AVATAR_MAX_PIXELS"] = int(os.getenv("AVATAR_MAX_PIXELS", "40000000"))
+    # werkzeug odrzuca większe żądania z 413 jeszcze przed parsowaniem formularza
+    app.config["MAX_CONTENT_LENGTH"] = app.config["AVATAR_MAX_BYTES"] + 1024 * 1024
+    app.config["JWT_BLOCKLIST_CACHE_SIZE"] = int(os.getenv("JWT_BLOCKLIST_CACHE_SIZE", "10000"))
+    app.config["JWT_BLOCKLIST_CACHE_TTL"] = int(os.getenv("JWT_BLOCKLIST_CACHE_TTL", "10"))
+    app.config["JWT_BLOCKLIST_SWEEP_INTERVAL"] = int(os.getenv("JWT_BLOCKLIST_SWEEP_INTERVAL", "3600"))
     app.config["MAIL_SERVER"] = os.getenv("MAIL_SERVER", "smtp.gmail.com")
     app.config["MAIL_PORT"] = os.getenv("MAIL_PORT", "587")
-    app.config['MAIL_USE_TLS'] = True
+    app.config['MAIL_USE_TLS'] = os.getenv("MAIL_USE_TLS", "1") == "1"
     app.config['MAIL_USE_SSL'] = False
     app.config['MAIL_USERNAME'] = os.getenv("MAIL_USERNAME")
     app.config['MAIL_PASSWORD'] = os.getenv("MAIL_PASSWORD")
     app.config['MAIL_DEFAULT_SENDER'] = os.getenv("MAIL_USERNAME")
     app.config['MAIL_DEBUG'] = False
     app.config['MAIL_SUPPRESS_SEND'] = False
+    app.config["TAG_INDEX_TTL"] = int(os.getenv("TAG_INDEX_TTL", "300"))
+    app.config["REFERENCE_CACHE_TTL"] = int(os.getenv("REFERENCE_CACHE_TTL", "300"))
+    app.config["CALENDAR_CACHE_SIZE"] = int(os.getenv("CALENDAR_CACHE_SIZE", "1024"))
+    app.config["CALENDAR_CACHE_TTL"] = int(os.getenv("CALENDAR_CACHE_TTL", "60"))
+    app.config["LOCATION_CACHE_SIZE"] = int(os.getenv("LOCATION_CACHE_SIZE", "4096"))
+    app.config["LOCATION_AUTOCOMPLETE_TTL"] = int(os.getenv("LOCATION_AUTOCOMPLETE_TTL", str(60 * 60)))
+    app.config["LOCATION_PLACE_TTL"] = int(os.getenv("LOCATION_PLACE_TTL", str(24 * 60 * 60)))
+    app.config["LOCATION_GEOCODE_TTL"] = int(os.getenv("LOCATION_GEOCODE_TTL", str(24 * 60 * 60)))
+    app.config["MAIL_QUEUE_WORKERS"] = int(os.getenv("MAIL_QUEUE_WORKERS", "1"))
+    app.config["MAIL_QUEUE_BATCH_SIZE"] = int(os.getenv("MAIL_QUEUE_BATCH_SIZE", "20"))
+    app.config["MAIL_QUEUE_MAX_ATTEMPTS"] = int(os.getenv("MAIL_QUEUE_MAX_ATTEMPTS", "5"))
+    app.config["MAIL_QUEUE_RETRY_DELAY"] = int(os.getenv("MAIL_QUEUE_RETRY_DELAY", "30"))
+    # plik wysyła wtedy serwer www (nginx/apache) na podstawie nagłówka X-Sendfile
+    app.config["USE_X_SENDFILE"] = os.getenv("USE_X_SENDFILE", "0") == "1"
+    # przy wielu workerach ustawić 0 i uruchomić `flask bootstrap` raz przed startem
+    app.config["AUTO_BOOTSTRAP"] = os.getenv("AUTO_BOOTSTRAP", "1") == "1"
 
 
 
@@ -57,25 +104,42 @@ def create_app(db_url=None):
 
     @jwt.token_in_blocklist_loader
     def check_if_token_is_revoked(jwt_header, jwt_payload: dict):
-        jti = jwt_payload["jti"]
-        token = BlockedTokenModel().query.filter_by(token=jti).first()
-        return token is not None
+        return token_blocklist.is_revoked(jwt_payload)
 
     CORS(app, resources={
         r"/*": {
             "origins": ["https://localhost:5173", "https://127.0.0.1:5173"],  # Dodaj używany port Vite
             "methods": ["GET", "POST", "PUT", "DELETE"],
             "allow_headers": ["Content-Type", "Authorization"],
+            "expose_headers": ["X-Next-Cursor", "ETag", "Last-Modified"],
             "supports_credentials": True
         }
     })
 
     db.init_app(app)
     mail.init_app(app)
-
+    mail_queue.init_app(app)
+    token_blocklist.init_app(app)
+    tag_index.init_app(app)
+    password_hasher.init_app(app)
+    http_client.init_app(app)
+    google_tokens.init_app(app)
+    avatar_pipeline.init_app(app)
+    asset_server.init_app(app)
+    change_tracker.init_app(app)
+    reference_data.init_app(app)
+    location_cache.init_app(app)
+
+    app.cli.add_command(bootstrap_command)
+    app.cli.add_command(reconcile_tag_counts_command)
+
+    # tylko odczyt wersji schematu, tworzenie tabel i ładowanie ikon robi `flask bootstrap`
     with app.app_context():
-        db.create_all()
-        initial_db_setup()
+        if not schema_is_current():
+            if app.config["AUTO_BOOTSTRAP"]:
+                bootstrap()
+            else:
+                app.logger.warning("Database schema is missing or outdated, run `flask bootstrap`")
 
     api.register_blueprint(UserBlueprint)
     api.register_blueprint(ImageBlueprint)
@@ -113,35 +177,6 @@ def create_app(db_url=None):
 
     return app
 
-def initial_db_setup():
-    if models.FileModel.query.count() != 0:
-        return None
-    default_profile_pic = models.FileModel(filename="default_profile.webp", upload_date=datetime.now(), url="https://api.seegest.com/static/images/default_profile.webp", mime_type="image/webp", size=2790)
-    db.session.add(default_profile_pic)
-    db.session.commit()
-
-    load_icons()
-
-def load_icons():
-    print("Loading icons...")
-    for file_name in os.listdir(os.path.join("static", "icons")):
-        file = FileModel.query.filter_by(filename=file_name).first()
-        icon = IconsModel.query.filter_by(name=file_name.split(".")[0].capitalize()).first()
-
-        if not file:
-            file = FileModel(filename=file_name, size=os.path.getsize(os.path.join("static", "icons", file_name)),
-                             mime_type="image/png", url=f"https://api.seegest.com/static/icons/{file_name}")
-            db.session.add(file)
-            db.session.commit()
-
-        if icon:
-            continue
-
-        icon = IconsModel(name=file_name.split(".")[0].capitalize(), file_id=file.id)
-        db.session.add(icon)
-        db.session.commit()
-
-
 if __name__ == "__main__":
     app = create_app()
     app.run()
@@ -0,0 +1,126 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import shutil
+import threading
+
+from flask import current_app, request, send_file
+from flask_smorest import abort
+from werkzeug.security import safe_join
+
+ASSETS_URL = "https://api.seegest.com/assets"
+ASSET_FOLDERS = (os.path.join("static", "images"), os.path.join("static", "icons"))
+HASH_LENGTH = 16
+ONE_YEAR = 365 * 24 * 3600
+# PNG i WEBP są już skompresowane, gzip opłaca się tylko dla formatów tekstowych
+COMPRESSIBLE_TYPES = ("image/svg+xml", "text/", "application/json", "application/javascript")
+MIN_COMPRESSION_GAIN = 0.1
+
+
+def content_hash(paths: list[str]) -> str:
+    """Skrót zawartości plików (w podanej kolejności), używany w adresach /assets/<hash>/<nazwa>"""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as file:
+            while chunk := file.read(64 * 1024):
+                digest.update(chunk)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def asset_url(digest: str, filename: str) -> str:
+    return f"{ASSETS_URL}/{digest}/{filename}"
+
+
+def find_asset(filename: str) -> str | None:
+    """Ścieżka pliku z static/images albo static/icons, None jeśli nie istnieje"""
+    for folder in ASSET_FOLDERS:
+        path = safe_join(os.path.join(current_app.root_path, folder), filename)
+        if path is not None and os.path.isfile(path):
+            return path
+    return None
+
+
+def is_compressible(mime_type: str) -> bool:
+    return mime_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def precompress(path: str) -> str | None:
+    """Zapisuje obok pliku wersję .gz, jeśli jest wyraźnie mniejsza. Zwraca jej ścieżkę albo None."""
+    compressed_path = f"{path}.gz"
+    if os.path.exists(compressed_path) and os.path.getmtime(compressed_path) >= os.path.getmtime(path):
+        return compressed_path
+
+    temp_path = f"{compressed_path}.{os.getpid()}.tmp"
+    with open(path, "rb") as source, gzip.GzipFile(temp_path, "wb", compresslevel=9, mtime=0) as target:
+        shutil.copyfileobj(source, target)
+
+    if os.path.getsize(temp_path) > os.path.getsize(path) * (1 - MIN_COMPRESSION_GAIN):
+        os.remove(temp_path)
+        return None
+    os.replace(temp_path, compressed_path)
+    return compressed_path
+
+
+class AssetServer:
+    """
+    Serwuje avatary i ikony pod adresami /assets/<hash>/<nazwa>. Adres zmienia się razem z zawartością,
+    więc odpowiedź może być cache'owana przez rok jako immutable, a klienci i CDN nie muszą jej rewalidować.
+    ETag jest silny (hash zawartości), Range obsługuje send_file, a przy USE_X_SENDFILE plik wysyła serwer www.
+    Skróty plików liczymy raz i pamiętamy do zmiany mtime lub rozmiaru.
+    """
+
+    def __init__(self, app=None):
+        self._hashes = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.add_url_rule("/assets/<digest>/<path:filename>", "assets", self.serve)
+        app.extensions["assets"] = self
+
+    def serve(self, digest: str, filename: str):
+        path = find_asset(filename)
+        if path is None:
+            abort(404, message="Asset not found")
+
+        current, compressed_path = self._describe(path)
+        # stary hash w adresie: oddajemy aktualny plik, ale bez długiego cache, bo pod tym adresem była inna treść
+        immutable = digest == current
+
+        send_path, etag = path, current
+        if compressed_path is not None and "gzip" in request.accept_encodings:
+            send_path, etag = compressed_path, f"{current}-gz"
+
+        response = send_file(send_path, mimetype=self._mime_type(filename), etag=etag, conditional=True,
+                             max_age=ONE_YEAR if immutable else 0)
+        if send_path is not path:
+            response.headers["Content-Encoding"] = "gzip"
+        if compressed_path is not None:
+            response.vary.add("Accept-Encoding")
+        response.cache_control.public = True
+        response.cache_control.immutable = immutable
+        if not immutable:
+            response.cache_control.no_cache = True
+        return response
+
+    def _describe(self, path: str) -> tuple[str, str | None]:
+        stat = os.stat(path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = self._hashes.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1], cached[2]
+
+        with self._lock:
+            digest = content_hash([path])
+            compressed_path = precompress(path) if is_compressible(self._mime_type(path)) else None
+            self._hashes[path] = (key, digest, compressed_path)
+        return digest, compressed_path
+
+    @staticmethod
+    def _mime_type(filename: str) -> str:
+        return mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+
+asset_server = AssetServer()
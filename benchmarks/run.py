@@ -0,0 +1,269 @@
+"""
+Benchmark najczęściej wywoływanych endpointów. Tworzy aplikację na pustej bazie (domyślnie plik SQLite
+w katalogu tymczasowym, opcjonalnie lokalny Postgres przez --db-url), wypełnia ją danymi z benchmarks/seed.py
+i dla każdego endpointu mierzy percentyle czasu odpowiedzi, przepustowość i liczbę zapytań SQL na żądanie.
+Wynik w JSON (stdout albo --output) można porównywać między commitami. Jeśli któreś żądanie przekroczy
+budżet zapytań z QUERY_BUDGETS, skrypt kończy się kodem 1, więc nadaje się też do CI.
+
+Przykłady (z katalogu głównego repozytorium):
+    python -m benchmarks.run
+    python -m benchmarks.run --posts 20000 --requests 500 --output results.json
+    python -m benchmarks.run --db-url postgresql://localhost/seegest_bench --endpoints search-posts tags
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from datetime import datetime, timedelta
+
+from benchmarks.seed import BENCH_PASSWORD, CENTER, SeedConfig, seed
+
+PERCENTILES = (50, 90, 95, 99)
+LOGGED_IN_USERS = 10
+
+
+def search_posts(context, rng):
+    now = datetime.now()
+    return "POST", "/search-posts", {"json": {
+        "position": {"latitude": CENTER[0] + rng.uniform(-0.1, 0.1), "longitude": CENTER[1] + rng.uniform(-0.1, 0.1)},
+        "radius_km": rng.choice([1, 2, 5, 10]),
+        "date_from": (now - timedelta(days=rng.choice([1, 7, 30]))).isoformat(),
+        "date_to": now.isoformat(),
+        "limit": 50
+    }}
+
+
+def calendar_preview(context, rng):
+    month = datetime.now() - timedelta(days=rng.randint(0, 60))
+    return "POST", "/calendar-preview", {"json": {
+        "month": month.month, "year": month.year, "offset": rng.choice([0, 1]), "counts_only": rng.random() < 0.5
+    }}
+
+
+def tags(context, rng):
+    name = rng.choice(context["tag_names"])
+    return "GET", "/tags", {"query_string": {"query": name[:rng.randint(1, min(4, len(name)))]}}
+
+
+def post(context, rng):
+    return "GET", f"/post/{rng.choice(context['post_ids'])}", {}
+
+
+def comment(context, rng):
+    return "GET", f"/comment/{rng.choice(context['comment_ids'])}", {}
+
+
+def post_comments(context, rng):
+    return "GET", f"/post/{rng.choice(context['post_ids'])}/comments", {"query_string": {"limit": 50}}
+
+
+def my_notifications(context, rng):
+    return "GET", "/my-notifications", {"query_string": {"limit": 50}, "headers": rng.choice(context["auth_headers"])}
+
+
+def login(context, rng):
+    return "POST", "/login", {"json": {"email": rng.choice(context["user_emails"]), "password": BENCH_PASSWORD}}
+
+
+ENDPOINTS = {
+    "search-posts": search_posts,
+    "calendar-preview": calendar_preview,
+    "tags": tags,
+    "post": post,
+    "comment": comment,
+    "post-comments": post_comments,
+    "my-notifications": my_notifications,
+    "login": login,
+}
+
+
+# największa dozwolona liczba zapytań SQL na jedno żądanie, nie może rosnąć z liczbą zwracanych wierszy
+QUERY_BUDGETS = {
+    "search-posts": 2,
+    "calendar-preview": 2,
+    "tags": 2,
+    "post": 3,
+    "comment": 3,
+    "post-comments": 2,
+    # sprawdzenie tokenu, strona, przedmioty (posty i komentarze) i oznaczenie jako przeczytane
+    "my-notifications": 5,
+    "login": 2,
+}
+
+
+def percentile(sorted_values: list[float], percent: int) -> float:
+    """Percentyl metodą najbliższej rangi"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def run_endpoint(app, name, build_request, context, requests: int, warmup: int, concurrency: int, engine, seed_value: int):
+    from db import count_queries
+
+    samples = []
+    lock = threading.Lock()
+
+    def worker(worker_id: int, count: int, record: bool):
+        rng = random.Random(f"{seed_value}-{name}-{worker_id}-{record}")
+        client = app.test_client()
+        for _ in range(count):
+            method, path, kwargs = build_request(context, rng)
+            with count_queries(engine) as queries:
+                start = time.perf_counter()
+                response = client.open(path, method=method, **kwargs)
+                elapsed = time.perf_counter() - start
+            if record:
+                with lock:
+                    samples.append((elapsed, queries.count, response.status_code))
+
+    worker(0, warmup, False)
+
+    per_worker = [requests // concurrency + (1 if index < requests % concurrency else 0) for index in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(worker, index, count, True) for index, count in enumerate(per_worker)]:
+            future.result()
+    wall_time = time.perf_counter() - started
+
+    latencies = sorted(sample[0] * 1000 for sample in samples)
+    queries = [sample[1] for sample in samples]
+    statuses = {}
+    for _, _, status in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    return {
+        "requests": len(samples),
+        "latency_ms": {
+            **{f"p{percent}": round(percentile(latencies, percent), 3) for percent in PERCENTILES},
+            "mean": round(sum(latencies) / len(latencies), 3),
+            "min": round(latencies[0], 3),
+            "max": round(latencies[-1], 3),
+        },
+        "throughput_rps": round(len(samples) / wall_time, 2),
+        "queries_per_request": {
+            "mean": round(sum(queries) / len(queries), 2),
+            "max": max(queries),
+        },
+        "status_codes": statuses,
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", help="Empty database to seed, defaults to a new SQLite file in a temporary directory")
+    parser.add_argument("--users", type=int, default=SeedConfig.users)
+    parser.add_argument("--posts", type=int, default=SeedConfig.posts)
+    parser.add_argument("--tags", type=int, default=SeedConfig.tags)
+    parser.add_argument("--comments-per-post", type=int, default=SeedConfig.comments_per_post)
+    parser.add_argument("--comment-depth", type=int, default=SeedConfig.comment_depth)
+    parser.add_argument("--notifications-per-user", type=int, default=SeedConfig.notifications_per_user)
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests per endpoint before measuring")
+    parser.add_argument("--concurrency", type=int, default=1, help="Number of client threads")
+    parser.add_argument("--endpoints", nargs="+", choices=list(ENDPOINTS), default=list(ENDPOINTS))
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for data and request parameters")
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    # wysyłka maili i przetwarzanie avatarów nie są mierzone
+    os.environ.setdefault("MAIL_QUEUE_WORKERS", "0")
+    os.environ.setdefault("AVATAR_WORKERS", "0")
+
+    from app import create_app
+    from db import db
+
+    temp_dir = None
+    db_url = args.db_url
+    if db_url is None:
+        temp_dir = tempfile.TemporaryDirectory(prefix="seegest-bench-")
+        db_url = f"sqlite:///{os.path.join(temp_dir.name, 'bench.db')}"
+
+    app = create_app(db_url)
+    config = SeedConfig(users=args.users, posts=args.posts, tags=args.tags, comments_per_post=args.comments_per_post,
+                        comment_depth=args.comment_depth, notifications_per_user=args.notifications_per_user,
+                        random_seed=args.seed)
+
+    with app.app_context():
+        started = time.perf_counter()
+        seeded = seed(config)
+        seed_time = time.perf_counter() - started
+        dialect = db.engine.dialect.name
+        engine = db.engine
+
+    client = app.test_client()
+    auth_headers = []
+    for email in seeded.user_emails[:LOGGED_IN_USERS]:
+        token = client.post("/login", json={"email": email, "password": BENCH_PASSWORD}).json["token"]
+        auth_headers.append({"Authorization": f"Bearer {token}"})
+
+    context = {
+        "post_ids": seeded.post_ids,
+        "comment_ids": seeded.comment_ids,
+        "tag_names": seeded.tag_names,
+        "user_emails": seeded.user_emails,
+        "auth_headers": auth_headers,
+    }
+
+    results = {}
+    over_budget = []
+    for name in args.endpoints:
+        results[name] = run_endpoint(app, name, ENDPOINTS[name], context, args.requests, args.warmup, args.concurrency, engine, args.seed)
+        queries = results[name]["queries_per_request"]
+        queries["budget"] = QUERY_BUDGETS[name]
+        latency = results[name]["latency_ms"]
+        print(f"{name:18} p50 {latency['p50']:8.2f} ms  p99 {latency['p99']:8.2f} ms  "
+              f"{results[name]['throughput_rps']:8.1f} req/s  {queries['mean']:6.1f} queries/req (max {queries['max']}, budget {queries['budget']})",
+              file=sys.stderr)
+        if queries["max"] > queries["budget"]:
+            over_budget.append(f"{name}: {queries['max']} queries per request, budget {queries['budget']}")
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "database": dialect,
+            "seed": asdict(config),
+            "seed_seconds": round(seed_time, 2),
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+        },
+        "results": results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+    if temp_dir is not None:
+        engine.dispose()
+        temp_dir.cleanup()
+
+    if over_budget:
+        print("Query budget exceeded:\n  " + "\n  ".join(over_budget), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Generator danych syntetycznych dla benchmarków. Wstawia wiersze wsadowo (INSERT ... VALUES dla wielu wierszy),
+z góry nadając id, więc wymaga pustych tabel. Liczniki (tags.count, comments_count, replies_count) i geohash
+są liczone tak, jak zrobiłyby to modele, żeby zapytania działały na spójnych danych.
+"""
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from db import db
+from geo import encode_geohash
+from models import CommentModel, IconsModel, NotificationModel, PostModel, PostsTagsModel, TagsModel, UserModel
+from passwords import password_hasher
+
+BENCH_PASSWORD = "Benchmark1!"
+# okolice Bydgoszczy, posty rozrzucone w promieniu ~20 km
+CENTER = (53.1235, 18.0084)
+SPREAD_DEGREES = 0.18
+CHUNK_SIZE = 2000
+
+
+@dataclass
+class SeedConfig:
+    users: int = 200
+    posts: int = 5000
+    tags: int = 500
+    tags_per_post: int = 3
+    comments_per_post: int = 5
+    comment_depth: int = 3
+    notifications_per_user: int = 50
+    days: int = 90
+    random_seed: int = 1
+
+
+@dataclass
+class SeedResult:
+    user_emails: list
+    post_ids: list
+    comment_ids: list
+    tag_names: list
+
+
+def _insert(model, rows: list[dict]):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        db.session.execute(insert(model), rows[start:start + CHUNK_SIZE])
+
+
+def seed(config: SeedConfig) -> SeedResult:
+    """Wypełnia pustą bazę danymi według config, wymaga kontekstu aplikacji"""
+    if db.session.query(PostModel.id).first() is not None or db.session.query(UserModel.id).first() is not None:
+        raise RuntimeError("Benchmark data can only be seeded into an empty database")
+
+    rng = random.Random(config.random_seed)
+    now = datetime.now().replace(microsecond=0)
+    icon_ids = [icon_id for icon_id, in db.session.query(IconsModel.id)]
+
+    # jeden hash dla wszystkich, inaczej seedowanie trwałoby tyle, ile config.users logowań
+    password = password_hasher.hash(BENCH_PASSWORD)
+    users = [{
+        "id": user_id, "name": f"User{user_id}", "surname": "Bench", "email": f"user{user_id}@bench.local",
+        "password": password, "created": now, "avatar_id": 1, "is_admin": False, "is_super_admin": False
+    } for user_id in range(1, config.users + 1)]
+    _insert(UserModel, users)
+
+    words = ["kawa", "koncert", "rower", "spacer", "park", "rynek", "wystawa", "mecz", "festiwal", "targi",
+             "jazz", "kino", "teatr", "bieg", "plaża", "wisła", "stare-miasto", "food-truck", "joga", "warsztaty"]
+    tag_names = []
+    for index in range(config.tags):
+        name = words[index % len(words)] if index < len(words) else f"{rng.choice(words)}-{index}"
+        tag_names.append(name)
+    tag_counts = [0] * config.tags
+
+    posts, posts_tags = [], []
+    for post_id in range(1, config.posts + 1):
+        latitude = CENTER[0] + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES)
+        longitude = CENTER[1] + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES)
+        posts.append({
+            "id": post_id, "title": f"Post {post_id}", "content": "Lorem ipsum " * rng.randint(5, 40),
+            "location": "Bydgoszcz", "latitude": latitude, "longitude": longitude,
+            "geohash": encode_geohash(latitude, longitude),
+            "created_at": now - timedelta(minutes=rng.randint(0, config.days * 24 * 60)),
+            "icon_id": rng.choice(icon_ids), "author_id": rng.randint(1, config.users),
+            "is_anonymous": rng.random() < 0.2, "comments_count": 0
+        })
+        for tag_index in rng.sample(range(config.tags), min(config.tags_per_post, config.tags)):
+            tag_counts[tag_index] += 1
+            posts_tags.append({"post_id": post_id, "tag_id": tag_index + 1})
+
+    _insert(TagsModel, [{"id": index + 1, "name": name, "count": tag_counts[index]} for index, name in enumerate(tag_names)])
+
+    comments = []
+    for post in posts:
+        post_comments = []
+        for position in range(config.comments_per_post):
+            # odpowiedź na losowy wcześniejszy komentarz posta, o ile nie przekroczy comment_depth
+            candidates = [comment for comment in post_comments if comment["path"].count(".") + 1 < config.comment_depth]
+            parent = rng.choice(candidates + [None]) if candidates else None
+            comment_id = len(comments) + 1
+            comment = {
+                "id": comment_id, "content": "Komentarz " * rng.randint(1, 10), "user_id": rng.randint(1, config.users),
+                "post_id": post["id"], "parent_comment_id": parent["id"] if parent else None,
+                "path": f"{parent['path']}.{comment_id}" if parent else str(comment_id),
+                "created_at": post["created_at"] + timedelta(minutes=position + 1),
+                "is_anonymous": rng.random() < 0.1, "replies_count": 0
+            }
+            for ancestor_id in comment["path"].split(".")[:-1]:
+                comments[int(ancestor_id) - 1]["replies_count"] += 1
+            post["comments_count"] += 1
+            comments.append(comment)
+            post_comments.append(comment)
+
+    _insert(PostModel, posts)
+    _insert(PostsTagsModel, posts_tags)
+    _insert(CommentModel, comments)
+
+    notifications = []
+    for user_id in range(1, config.users + 1):
+        for _ in range(config.notifications_per_user):
+            if comments and rng.random() < 0.5:
+                subject_type, subject_id = "CommentModel", rng.randint(1, len(comments))
+            else:
+                subject_type, subject_id = "PostModel", rng.randint(1, config.posts)
+            notifications.append({
+                "user_id": user_id, "responder_id": rng.randint(1, config.users), "is_responder_anonymous": rng.random() < 0.1,
+                "is_read": rng.random() < 0.5, "created_at": now - timedelta(minutes=rng.randint(0, config.days * 24 * 60)),
+                "subject_type": subject_type, "subject_id": subject_id
+            })
+    _insert(NotificationModel, notifications)
+
+    if db.engine.dialect.name == "postgresql":
+        # id nadawaliśmy sami, więc sekwencje trzeba przestawić za ostatni wiersz
+        for model in (UserModel, TagsModel, PostModel, CommentModel):
+            table = model.__tablename__
+            db.session.execute(db.text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))"))
+
+    db.session.commit()
+
+    return SeedResult(user_emails=[user["email"] for user in users], post_ids=[post["id"] for post in posts],
+                      comment_ids=[comment["id"] for comment in comments], tag_names=tag_names)
@@ -0,0 +1,72 @@
+"""
+Porównuje szybkie serializery (serializers.py) z marshmallow: dla każdego schematu sprawdza, czy JSON
+jest identyczny bajt w bajt, i mierzy czas dump() w obu trybach.
+
+Uruchomienie z katalogu głównego repozytorium:
+    python -m benchmarks.serializers [--posts 500] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+from app import create_app
+from benchmarks.seed import SeedConfig, seed
+from models import CommentModel, PostModel, TagsModel
+from schemas import CommentSchema, PlainTagSchema, PostSchema
+
+CASES = (
+    ("PostSchema(many=True)", PostSchema(many=True), lambda: PostModel.query.options(*PostModel.serialization_options()).all()),
+    ("PostSchema(exclude=['author'])", PostSchema(many=True, exclude=['author']), lambda: PostModel.query.all()),
+    ("CommentSchema(many=True)", CommentSchema(many=True), lambda: CommentModel.query.all()),
+    ("CommentSchema(exclude=[author, replies])", CommentSchema(many=True, exclude=['author', 'replies']), lambda: CommentModel.query.all()),
+    ("CommentSchema(exclude=[post, replies, parent_comment])", CommentSchema(many=True, exclude=["post", "replies", "parent_comment"]),
+     lambda: CommentModel.query.options(*CommentModel.serialization_options()).all()),
+    ("PlainTagSchema(many=True)", PlainTagSchema(many=True), lambda: TagsModel.query.all()),
+)
+
+
+def measure(schema, items, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        schema.dump(items)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # baza w pamięci ma jedno połączenie, więc wątki kolejki maili nie mogą go współdzielić
+    os.environ["MAIL_QUEUE_WORKERS"] = "0"
+    app = create_app("sqlite://")
+
+    failed = False
+    with app.app_context():
+        seed(SeedConfig(users=20, posts=args.posts, tags=50, comments_per_post=3, notifications_per_user=0))
+
+        for name, schema, load in CASES:
+            items = load()
+
+            app.config["FAST_SERIALIZERS"] = False
+            expected = app.json.dumps(schema.dump(items))
+            slow = measure(schema, items, args.repeat)
+
+            app.config["FAST_SERIALIZERS"] = True
+            actual = app.json.dumps(schema.dump(items))
+            fast = measure(schema, items, args.repeat)
+
+            identical = expected == actual
+            failed = failed or not identical
+            print(f"{name:60} {len(items):6} rows  marshmallow {slow * 1000:8.2f} ms  fast {fast * 1000:8.2f} ms  "
+                  f"x{slow / fast:5.1f}  {'identical' if identical else 'DIFFERENT'}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from db import db
+from models.blocked_tokens import BlockedTokenModel
+
+
+class TokenBlocklist:
+    """
+    Sprawdzanie unieważnionych tokenów JWT z ograniczonym cache w pamięci procesu.
+
+    Unieważniony token jest trzymany w cache aż do wygaśnięcia (wtedy i tak zostałby odrzucony),
+    wynik negatywny tylko przez krótki czas, żeby wylogowanie obsłużone przez inny proces
+    zostało zauważone najpóźniej po JWT_BLOCKLIST_CACHE_TTL sekundach.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._sweeper = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.max_size = app.config.get("JWT_BLOCKLIST_CACHE_SIZE", 10000)
+        self.negative_ttl = app.config.get("JWT_BLOCKLIST_CACHE_TTL", 10)
+        self.sweep_interval = app.config.get("JWT_BLOCKLIST_SWEEP_INTERVAL", 3600)
+        app.extensions["token_blocklist"] = self
+
+        if self.sweep_interval and self._sweeper is None:
+            self._sweeper = threading.Thread(target=self._run_sweeper, name="token-blocklist-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def is_revoked(self, jwt_payload: dict) -> bool:
+        jti = jwt_payload["jti"]
+        now = time.time()
+
+        with self._lock:
+            entry = self._cache.get(jti)
+            if entry is not None:
+                revoked, valid_until = entry
+                if valid_until > now:
+                    self._cache.move_to_end(jti)
+                    return revoked
+                del self._cache[jti]
+
+        revoked = db.session.query(
+            BlockedTokenModel.query.filter_by(token=jti).exists()
+        ).scalar()
+
+        expires = jwt_payload.get("exp", float("inf"))
+        self._remember(jti, revoked, expires if revoked else min(now + self.negative_ttl, expires))
+        return revoked
+
+    def block(self, jwt_payload: dict) -> BlockedTokenModel:
+        """Dodaje token do sesji (commit należy do wywołującego) i od razu oznacza go w cache"""
+        expires = jwt_payload.get("exp")
+        blocked_token = BlockedTokenModel(
+            token=jwt_payload["jti"],
+            expires_at=datetime.fromtimestamp(expires) if expires else None,
+        )
+        db.session.add(blocked_token)
+
+        self._remember(jwt_payload["jti"], True, expires or float("inf"))
+        return blocked_token
+
+    def purge_expired(self) -> int:
+        """Usuwa z bazy tokeny, które i tak już wygasły"""
+        deleted = BlockedTokenModel.query.filter(BlockedTokenModel.expires_at < datetime.now()).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+
+    def _remember(self, jti: str, revoked: bool, valid_until: float):
+        with self._lock:
+            self._cache[jti] = (revoked, valid_until)
+            self._cache.move_to_end(jti)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+    def _run_sweeper(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            with self.app.app_context():
+                try:
+                    deleted = self.purge_expired()
+                    if deleted:
+                        self.app.logger.info(f"Purged {deleted} expired blocked tokens")
+                except Exception as error:
+                    db.session.rollback()
+                    self.app.logger.error(f"Blocked tokens sweeper error: {error}")
+                finally:
+                    db.session.remove()
+
+
+token_blocklist = TokenBlocklist()
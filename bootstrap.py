@@ -0,0 +1,212 @@
+import os
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, inspect, insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import aliased
+
+from assets import asset_url, content_hash
+from db import db
+from generations import TRACKED, change_tracker, utcnow
+from geo import encode_geohash
+from models import ChangeGenerationModel, CommentModel, FileModel, IconsModel, PostModel, SchemaVersionModel, TagsModel
+
+# podbić przy każdej zmianie modeli albo danych startowych, żeby `flask bootstrap` trzeba było uruchomić ponownie
+SCHEMA_VERSION = 6
+# wersja, od której comments_count i replies_count są utrzymywane przy zapisie
+COUNTERS_VERSION = 5
+ICONS_FOLDER = os.path.join("static", "icons")
+DEFAULT_AVATAR_PATH = os.path.join("static", "images", "default_profile.webp")
+
+
+def schema_version() -> int | None:
+    """Wersja zapisana w bazie albo None, jeśli bazy jeszcze nie przygotowano. Jedno zapytanie po kluczu głównym."""
+    try:
+        return db.session.execute(select(SchemaVersionModel.version).where(SchemaVersionModel.id == 1)).scalar()
+    except SQLAlchemyError:
+        # brak tabeli, na Postgresie transakcja jest wtedy przerwana
+        db.session.rollback()
+        return None
+
+
+def schema_is_current() -> bool:
+    version = schema_version()
+    return version is not None and version >= SCHEMA_VERSION
+
+
+def bootstrap():
+    """
+    Tworzy brakujące tabele, kolumny i indeksy, dodaje domyślny avatar i ikony ze static/icons, uzupełnia skróty
+    plików i zapisuje SCHEMA_VERSION. Można uruchamiać wielokrotnie, dodaje tylko to, czego brakuje.
+    Wymaga kontekstu aplikacji.
+    """
+    previous_version = schema_version()
+
+    db.create_all()
+    add_missing_columns()
+    add_missing_indexes()
+    added = sync_icons()
+    backfill_content_hashes()
+    backfill_geohashes()
+    if previous_version is None or previous_version < COUNTERS_VERSION:
+        recount_comment_counters()
+    add_change_generations()
+
+    version = db.session.get(SchemaVersionModel, 1)
+    if version is None:
+        db.session.add(SchemaVersionModel(id=1, version=SCHEMA_VERSION))
+    else:
+        version.version = SCHEMA_VERSION
+    db.session.commit()
+    return added
+
+
+def add_missing_columns():
+    """create_all nie zmienia istniejących tabel, więc nowe kolumny modeli dodajemy przez ALTER TABLE"""
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            definition = f"{column.name} {column.type.compile(dialect=db.engine.dialect)}"
+            if column.server_default is not None:
+                definition += f" DEFAULT '{column.server_default.arg}'"
+            db.session.execute(db.text(f"ALTER TABLE {table.name} ADD COLUMN {definition}"))
+    db.session.commit()
+
+
+def add_missing_indexes():
+    """Indeksy dodane do istniejących tabel, create_all ich nie tworzy. checkfirst pomija te, które już są."""
+    connection = db.session.connection()
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=connection, checkfirst=True)
+    db.session.commit()
+
+
+def backfill_content_hashes():
+    """Przestawia adresy gotowych plików bez content_hash na /assets/<hash>/..., czyta każdy plik raz"""
+    for file in FileModel.query.filter(FileModel.content_hash.is_(None), FileModel.status == 'ready'):
+        file.refresh_hashes()
+    db.session.commit()
+
+
+def backfill_geohashes():
+    """Posty sprzed kolumny geohash mają w niej NULL i bez tego nie przeszłyby filtra prefiksów w within_radius"""
+    rows = [
+        {"id": post_id, "geohash": encode_geohash(latitude, longitude)}
+        for post_id, latitude, longitude in db.session.execute(
+            select(PostModel.id, PostModel.latitude, PostModel.longitude).where(PostModel.geohash.is_(None))
+        )
+    ]
+    if rows:
+        db.session.execute(update(PostModel), rows)
+    db.session.commit()
+
+
+def recount_comment_counters():
+    """
+    Jednorazowe przeliczenie liczników komentarzy: istniejące wiersze dostały przy dodaniu kolumn 0,
+    a późniejsze usuwanie komentarzy zeszłoby z nimi poniżej zera.
+    """
+    comments_per_post = dict(db.session.execute(
+        select(CommentModel.post_id, func.count(CommentModel.id)).group_by(CommentModel.post_id)
+    ).all())
+    fixes = [
+        {"id": post_id, "comments_count": comments_per_post.get(post_id, 0)}
+        for post_id, count in db.session.execute(select(PostModel.id, PostModel.comments_count))
+        if count != comments_per_post.get(post_id, 0)
+    ]
+    if fixes:
+        db.session.execute(update(PostModel), fixes)
+
+    # replies_count to liczba wszystkich potomków, czyli komentarzy tego posta o ścieżce zaczynającej się od path
+    replies = aliased(CommentModel)
+    descendants = (
+        select(func.count(replies.id))
+        .where(replies.post_id == CommentModel.post_id, replies.path.like(CommentModel.path + '.%'))
+        .scalar_subquery()
+    )
+    db.session.execute(update(CommentModel).values(replies_count=descendants))
+    db.session.commit()
+
+
+def add_change_generations():
+    """Wiersze liczników zmian, które podbija change_tracker.bump()"""
+    existing = set(db.session.execute(select(ChangeGenerationModel.name)).scalars())
+    missing = [{"name": name, "generation": 0, "updated_at": utcnow()} for name in TRACKED if name not in existing]
+    if missing:
+        db.session.execute(insert(ChangeGenerationModel), missing)
+    db.session.commit()
+
+
+def sync_icons() -> tuple[int, int]:
+    """
+    Dodaje brakujące pliki i ikony jednym SELECT-em i jednym INSERT-em na tabelę, zamiast zapytań per plik.
+    Zmienionym na dysku plikom aktualizuje skrót i adres.
+    """
+    # domyślny avatar jako pierwszy, żeby na pustej bazie dostał id 1
+    files = {"default_profile.webp": _file_row(DEFAULT_AVATAR_PATH, "image/webp")}
+    icons = {}
+    for file_name in sorted(os.listdir(ICONS_FOLDER)):
+        files[file_name] = _file_row(os.path.join(ICONS_FOLDER, file_name), "image/png")
+        icons[file_name.split(".")[0].capitalize()] = file_name
+
+    existing_files = {}
+    changed_files = []
+    for file_id, file_name, digest in db.session.execute(
+        select(FileModel.id, FileModel.filename, FileModel.content_hash).where(FileModel.filename.in_(files))
+    ):
+        existing_files[file_name] = file_id
+        # plik podmieniony na dysku dostaje nowy adres, stary przestaje być cache'owany jako immutable
+        if digest != files[file_name]["content_hash"]:
+            row = files[file_name]
+            changed_files.append({"id": file_id, "url": row["url"], "content_hash": row["content_hash"], "size": row["size"]})
+    if changed_files:
+        db.session.execute(update(FileModel), changed_files)
+
+    missing_files = [row for name, row in files.items() if name not in existing_files]
+    if missing_files:
+        db.session.execute(insert(FileModel), missing_files)
+        existing_files.update(db.session.execute(
+            select(FileModel.filename, FileModel.id).where(FileModel.filename.in_([row["filename"] for row in missing_files]))
+        ).all())
+
+    existing_icons = set(db.session.execute(select(IconsModel.name).where(IconsModel.name.in_(icons))).scalars())
+    missing_icons = [{"name": name, "file_id": existing_files[file_name]} for name, file_name in icons.items() if name not in existing_icons]
+    if missing_icons:
+        db.session.execute(insert(IconsModel), missing_icons)
+
+    db.session.commit()
+    return len(missing_files), len(missing_icons)
+
+
+def _file_row(path: str, mime_type: str) -> dict:
+    file_name = os.path.basename(path)
+    digest = content_hash([path])
+    return {
+        "filename": file_name, "url": asset_url(digest, file_name), "content_hash": digest, "mime_type": mime_type,
+        "size": os.path.getsize(path), "upload_date": datetime.now()
+    }
+
+
+@click.command("bootstrap")
+@with_appcontext
+def bootstrap_command():
+    """Przygotowuje bazę (tabele, domyślny avatar, ikony). Uruchamiać raz przed startem workerów."""
+    files, icons = bootstrap()
+    click.echo(f"Database ready (schema version {SCHEMA_VERSION}), added {files} files and {icons} icons")
+
+
+@click.command("reconcile-tag-counts")
+@with_appcontext
+def reconcile_tag_counts_command():
+    """Przelicza liczniki tagów z posts_tags, np. okresowo z crona albo po ręcznych zmianach w bazie."""
+    fixed = TagsModel.reconcile_counts()
+    if fixed:
+        change_tracker.bump("tags")
+    db.session.commit()
+    click.echo(f"Fixed {fixed} tag counts")
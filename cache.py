@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class MemoryBackend:
+    """Magazyn w pamięci procesu: wpisy wygasają po ttl sekundach, a po przekroczeniu max_size usuwane są najdawniej używane"""
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return _MISSING
+
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return _MISSING
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: float):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TTLCache:
+    """
+    Cache z czasem życia wpisów i licznikami trafień. Domyślnie trzyma dane w pamięci procesu (MemoryBackend),
+    ale można podać dowolny backend z metodami get/set/delete/clear, np. współdzielony między workerami.
+    Backend zwraca _MISSING, gdy nie ma wpisu.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300, backend=None):
+        self.ttl = ttl
+        self.backend = backend if backend is not None else MemoryBackend(max_size)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        value = self.backend.get(key)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl: float = None):
+        self.backend.set(key, value, self.ttl if ttl is None else ttl)
+
+    def delete(self, key):
+        self.backend.delete(key)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "size": len(self.backend)
+        }
+
+    def __len__(self):
+        return len(self.backend)
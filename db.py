@@ -1,3 +1,37 @@
+import threading
+from contextlib import contextmanager
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+
+db = SQLAlchemy()
+
+
+class QueryCounter:
+    """Liczy tylko zapytania z wątku, który go utworzył, więc równoległe żądania nie mieszają się ze sobą"""
+
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+        self._thread_id = threading.get_ident()
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() != self._thread_id:
+            return
+        self.count += 1
+        self.statements.append(statement)
+
 
-db = SQLAlchemy()
\ No newline at end of file
+@contextmanager
+def count_queries(engine=None):
+    """
+    Liczy zapytania SQL wykonane w bloku przez bieżący wątek. Bez engine wymaga kontekstu aplikacji.
+    Służy do pilnowania, żeby liczba zapytań endpointu nie rosła razem z liczbą zwracanych wierszy.
+    """
+    counter = QueryCounter()
+    engine = engine if engine is not None else db.engine
+    event.listen(engine, "before_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", counter)
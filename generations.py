@@ -0,0 +1,123 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+
+from flask import current_app, g, make_response, request
+from sqlalchemy import select, update
+
+from db import db
+from models import ChangeGenerationModel
+
+TRACKED = ("posts", "comments", "tags", "icons", "users")
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class ChangeTracker:
+    """
+    Numery zmian (generacje) dla grup tabel, trzymane w bazie, więc wspólne dla wszystkich workerów.
+    Zasoby zapisujące dane wołają bump() przed commitem, a endpointy do odczytu oznaczone conditional()
+    liczą ETag z generacji i przy pasującym If-None-Match (albo If-Modified-Since) odpowiadają 304
+    po jednym zapytaniu, bez wczytywania modeli i serializacji.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions["change_tracker"] = self
+
+    def bump(self, *names: str) -> dict:
+        """
+        Podbija generacje w bieżącej transakcji, zapis widać dopiero po commicie.
+        Zwraca {nazwa: nowa generacja}, czyli numer, który po commicie oznacza właśnie ten zapis.
+        """
+        rows = db.session.execute(
+            update(ChangeGenerationModel)
+            .where(ChangeGenerationModel.name.in_(names))
+            .values(generation=ChangeGenerationModel.generation + 1, updated_at=utcnow())
+            .returning(ChangeGenerationModel.name, ChangeGenerationModel.generation)
+        )
+        g.pop("change_generations", None)
+        return dict(rows.all())
+
+    def current(self, names) -> dict:
+        """{nazwa: (generacja, updated_at)}, zapamiętane do końca żądania"""
+        known = g.setdefault("change_generations", {})
+        missing = [name for name in names if name not in known]
+        if missing:
+            rows = db.session.execute(
+                select(ChangeGenerationModel.name, ChangeGenerationModel.generation, ChangeGenerationModel.updated_at)
+                .where(ChangeGenerationModel.name.in_(missing))
+            )
+            for name, generation, updated_at in rows:
+                known[name] = (generation, updated_at)
+            for name in missing:
+                known.setdefault(name, (0, None))
+        return {name: known[name] for name in names}
+
+    def generation(self, name: str) -> int:
+        return self.current((name,))[name][0]
+
+    def conditional(self, *names: str):
+        """
+        Dekorator widoku GET. ETag zależy od generacji podanych grup, adresu z parametrami i wersji API,
+        Last-Modified to najpóźniejsza zmiana w tych grupach. Musi być nad dekoratorami flask-smorest.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                generations = self.current(names)
+                etag = self._etag(generations)
+                last_modified = self._last_modified(generations)
+
+                if self._not_modified(etag, last_modified):
+                    response = current_app.response_class(status=304)
+                else:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+
+                response.set_etag(etag)
+                if last_modified is not None:
+                    response.last_modified = last_modified
+                # klient może trzymać odpowiedź, ale przed użyciem musi ją zwalidować
+                response.cache_control.no_cache = True
+                return response
+
+            return wrapper
+
+        return decorator
+
+    @staticmethod
+    def _etag(generations: dict) -> str:
+        state = ",".join(f"{name}:{generation}" for name, (generation, _) in sorted(generations.items()))
+        key = f"{current_app.config['API_VERSION']}|{request.full_path}|{state}"
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+
+    @staticmethod
+    def _last_modified(generations: dict) -> datetime | None:
+        timestamps = [updated_at for _, updated_at in generations.values() if updated_at is not None]
+        if not timestamps:
+            return None
+        latest = max(timestamps)
+        # Last-Modified ma dokładność do sekundy, więc podajemy go dopiero, gdy ta sekunda minęła,
+        # inaczej kolejna zmiana w tej samej sekundzie nie zmieniłaby nagłówka
+        if utcnow() - latest < timedelta(seconds=1):
+            return None
+        return latest.replace(microsecond=0, tzinfo=timezone.utc)
+
+    @staticmethod
+    def _not_modified(etag: str, last_modified: datetime | None) -> bool:
+        # ETag jest dokładniejszy, więc jeśli klient go przysłał, If-Modified-Since pomijamy
+        if request.if_none_match:
+            return request.if_none_match.contains_weak(etag)
+        if request.if_modified_since and last_modified is not None:
+            return last_modified <= request.if_modified_since
+        return False
+
+
+change_tracker = ChangeTracker()
@@ -0,0 +1,111 @@
+from math import asin, cos, degrees, radians, sin
+
+EARTH_RADIUS_KM = 6371
+# zapas na błędy zaokrągleń, żeby punkt dokładnie na okręgu nie wypadł z prostokąta
+BOX_MARGIN = 1e-9
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 9
+
+
+def encode_geohash(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Koduje współrzędne do geohasha o podanej długości"""
+    latitude = min(max(latitude, -90.0), 90.0)
+    longitude = ((longitude + 180.0) % 360.0) - 180.0
+
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(geohash) < precision:
+        if even:
+            middle = (lon_range[0] + lon_range[1]) / 2
+            if longitude >= middle:
+                bits = (bits << 1) | 1
+                lon_range[0] = middle
+            else:
+                bits = bits << 1
+                lon_range[1] = middle
+        else:
+            middle = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= middle:
+                bits = (bits << 1) | 1
+                lat_range[0] = middle
+            else:
+                bits = bits << 1
+                lat_range[1] = middle
+
+        even = not even
+        bit_count += 1
+
+        if bit_count == 5:
+            geohash.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(geohash)
+
+
+def cell_size(precision: int) -> tuple[float, float]:
+    """Zwraca wymiary komórki geohasha (szerokość, długość) w stopniach"""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = (5 * precision) // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lon_bits)
+
+
+def bounding_box(latitude: float, longitude: float, radius_km: float) -> tuple[float, float, float | None, float | None]:
+    """
+    Wyznacza prostokąt (min_lat, max_lat, min_lon, max_lon) opisany na okręgu o promieniu radius_km,
+    na tej samej kuli (EARTH_RADIUS_KM) co haversine w PostModel.distance_to, więc zawsze zawiera wszystkie jego trafienia.
+    Długość geograficzna nie jest zawijana, więc może wyjść poza zakres -180..180.
+    Gdy okrąg obejmuje biegun, ograniczenia długości nie ma i min_lon, max_lon są None.
+    """
+    distance = radius_km / EARTH_RADIUS_KM * (1 + BOX_MARGIN)
+    lat_delta = degrees(distance)
+    min_lat, max_lat = latitude - lat_delta, latitude + lat_delta
+
+    if min_lat <= -90.0 or max_lat >= 90.0 or sin(distance) >= cos(radians(latitude)):
+        return max(min_lat, -90.0), min(max_lat, 90.0), None, None
+
+    # największe odchylenie długości na okręgu wielkim, a nie radius / cos(lat), które przy dużych promieniach jest za małe
+    lon_delta = degrees(asin(sin(distance) / cos(radians(latitude))))
+    return min_lat, max_lat, longitude - lon_delta, longitude + lon_delta
+
+
+def covering_cells(latitude: float, longitude: float, radius_km: float) -> list[str]:
+    """
+    Zwraca prefiksy geohashy, które razem pokrywają cały okrąg o promieniu radius_km.
+
+    Wybieramy najdłuższy prefiks, którego komórka jest nie mniejsza niż promień,
+    wtedy punkty próbkowane co promień (środek, krawędzie i rogi) trafiają w każdą
+    komórkę przecinającą prostokąt. Pusta lista oznacza, że obszar jest zbyt duży
+    by filtrowanie po komórkach miało sens, albo przecina biegun lub południk 180°.
+    """
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+    # przy biegunach i południku 180° komórki nie układają się w ciągły obszar, wtedy filtrujemy bez nich
+    if min_lon is None or min_lon < -180 or max_lon > 180:
+        return []
+
+    lat_delta = max(max_lat - latitude, latitude - min_lat)
+    lon_delta = longitude - min_lon
+
+    precision = 0
+    for candidate in range(1, GEOHASH_PRECISION + 1):
+        lat_size, lon_size = cell_size(candidate)
+        if lat_size < lat_delta or lon_size < lon_delta:
+            break
+        precision = candidate
+
+    if precision == 0:
+        return []
+
+    cells = set()
+    for lat in (min_lat, latitude, max_lat):
+        for lon in (min_lon, longitude, max_lon):
+            cells.add(encode_geohash(lat, lon, precision))
+
+    return sorted(cells)
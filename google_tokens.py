@@ -0,0 +1,90 @@
+import hashlib
+import re
+import threading
+import time
+
+from google.auth import jwt as google_jwt
+from google.oauth2 import id_token
+
+from cache import TTLCache
+from http_client import http_client
+
+GOOGLE_CERTS_URL = id_token._GOOGLE_OAUTH2_CERTS_URL
+GOOGLE_ISSUERS = id_token._GOOGLE_ISSUERS
+MAX_AGE_PATTERN = re.compile(r"max-age=(\d+)")
+
+
+class GoogleTokenVerifier:
+    """
+    Weryfikacja Google ID tokenów bez pobierania certyfikatów przy każdym logowaniu. Certyfikaty trzymamy
+    tak długo, jak pozwala Cache-Control (Google podaje zwykle kilka godzin), a podpis sprawdzamy lokalnie.
+    Nieznany kid wymusza odświeżenie (rotacja kluczy), ale nie częściej niż co GOOGLE_CERTS_MIN_REFRESH sekund.
+    Poprawnie zweryfikowane tokeny pamiętamy krótko po hashu, bo klienci często ponawiają to samo żądanie.
+    """
+
+    def __init__(self, app=None):
+        self.default_certs_ttl = 300
+        self.min_refresh = 30
+        self._certs = None
+        self._certs_expire_at = 0
+        self._fetched_at = 0
+        self._lock = threading.Lock()
+        self.verified = TTLCache(max_size=1024, ttl=60)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.default_certs_ttl = app.config.get("GOOGLE_CERTS_DEFAULT_TTL", 300)
+        self.min_refresh = app.config.get("GOOGLE_CERTS_MIN_REFRESH", 30)
+        self.verified = TTLCache(max_size=1024, ttl=app.config.get("GOOGLE_TOKEN_MEMO_TTL", 60))
+        app.extensions["google_tokens"] = self
+
+    def verify(self, token: str, audience=None) -> dict:
+        """Odpowiednik id_token.verify_oauth2_token, przy błędnym tokenie rzuca ValueError"""
+        if isinstance(token, bytes):
+            token = token.decode("utf-8")
+
+        memo_key = (hashlib.sha256(token.encode("utf-8")).hexdigest(), audience)
+        idinfo = self.verified.get(memo_key)
+        if idinfo is not None:
+            return dict(idinfo)
+
+        kid = google_jwt.decode_header(token).get("kid")
+        certs = self._get_certs(kid)
+        idinfo = google_jwt.decode(token, certs=certs, audience=audience)
+
+        if idinfo["iss"] not in GOOGLE_ISSUERS:
+            raise ValueError(f"Wrong issuer. 'iss' should be one of the following: {GOOGLE_ISSUERS}")
+
+        ttl = min(self.verified.ttl, idinfo["exp"] - time.time())
+        if ttl > 0:
+            self.verified.set(memo_key, idinfo, ttl)
+
+        return dict(idinfo)
+
+    def _get_certs(self, kid: str | None) -> dict:
+        certs = self._certs
+        if certs is not None and time.monotonic() < self._certs_expire_at and (kid is None or kid in certs):
+            return certs
+
+        with self._lock:
+            # w międzyczasie inny wątek mógł już pobrać certyfikaty
+            now = time.monotonic()
+            fresh = self._certs is not None and now < self._certs_expire_at
+            if fresh and (kid is None or kid in self._certs or now - self._fetched_at < self.min_refresh):
+                return self._certs
+
+            response = http_client.get(GOOGLE_CERTS_URL)
+            response.raise_for_status()
+
+            self._certs = response.json()
+            self._fetched_at = now
+            self._certs_expire_at = now + self._max_age(response.headers.get("Cache-Control", ""))
+            return self._certs
+
+    def _max_age(self, cache_control: str) -> int:
+        match = MAX_AGE_PATTERN.search(cache_control)
+        return int(match.group(1)) if match else self.default_certs_ttl
+
+
+google_tokens = GoogleTokenVerifier()
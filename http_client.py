@@ -0,0 +1,170 @@
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from google.auth import exceptions as google_exceptions
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Host ma otwarty obwód, więc żądanie nie zostało nawet wysłane"""
+
+
+class CircuitBreaker:
+    """
+    Licznik kolejnych błędów dla jednego hosta. Po threshold błędach obwód się otwiera i przez reset_timeout
+    sekund żądania od razu dostają CircuitOpenError. Potem przepuszczane jest jedno żądanie próbne -
+    sukces zamyka obwód, błąd otwiera go ponownie.
+    """
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 30):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self._trial_running or time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class OutboundSession(requests.Session):
+    """Sesja z domyślnymi timeoutami i bezpiecznikiem per host, nie pozwala też na żądania bez limitu czasu"""
+
+    def __init__(self, timeout: tuple, max_timeout: float, breaker_threshold: int, breaker_reset: float):
+        super().__init__()
+        self.timeout = timeout
+        self.max_timeout = max_timeout
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self._breakers = {}
+        self._breakers_lock = threading.Lock()
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        with self._breakers_lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(self.breaker_threshold, self.breaker_reset)
+            return self._breakers[host]
+
+    def request(self, method, url, *args, **kwargs):
+        # biblioteka google przekazuje timeout=120, więc ograniczamy też jawnie podane wartości
+        timeout = kwargs.get("timeout")
+        if timeout is None:
+            kwargs["timeout"] = self.timeout
+        elif isinstance(timeout, (int, float)):
+            kwargs["timeout"] = min(timeout, self.max_timeout)
+
+        host = urlsplit(url).netloc
+        breaker = self.breaker(host)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit open for {host}")
+
+        # wynik zapisujemy w finally, żeby każdy wyjątek (np. ChunkedEncodingError) kończył też żądanie próbne
+        succeeded = False
+        try:
+            response = super().request(method, url, *args, **kwargs)
+            succeeded = response.status_code < 500
+            return response
+        finally:
+            if succeeded:
+                breaker.record_success()
+            else:
+                breaker.record_failure()
+
+
+class OutboundClient:
+    """
+    Wspólny klient dla wszystkich wywołań zewnętrznych API (Google, Facebook). Trzyma pulę połączeń keep-alive
+    na host, ustawia timeouty połączenia i odczytu, ponawia idempotentne żądania z losowym opóźnieniem
+    i odcina host, który przestał odpowiadać, zamiast blokować kolejne workery.
+    """
+
+    def __init__(self, app=None):
+        self.config = {"pool_size": 10, "timeout": (3.05, 10), "retries": 2, "breaker_threshold": 5, "breaker_reset": 30}
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.config = {
+            "pool_size": app.config.get("HTTP_POOL_SIZE", 10),
+            "timeout": (app.config.get("HTTP_CONNECT_TIMEOUT", 3.05), app.config.get("HTTP_READ_TIMEOUT", 10)),
+            "retries": app.config.get("HTTP_RETRIES", 2),
+            "breaker_threshold": app.config.get("HTTP_BREAKER_THRESHOLD", 5),
+            "breaker_reset": app.config.get("HTTP_BREAKER_RESET", 30)
+        }
+        self._session = None
+        app.extensions["http_client"] = self
+        app.register_error_handler(requests.RequestException, self._handle_error)
+        app.register_error_handler(google_exceptions.TransportError, self._handle_error)
+
+    @property
+    def session(self) -> OutboundSession:
+        # po forku workera gunicorna nie współdzielimy gniazd z procesem nadrzędnym
+        if self._session is None or self._pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._pid != os.getpid():
+                    self._session = self._build_session()
+                    self._pid = os.getpid()
+        return self._session
+
+    def _build_session(self) -> OutboundSession:
+        config = self.config
+        session = OutboundSession(config["timeout"], sum(config["timeout"]), config["breaker_threshold"], config["breaker_reset"])
+
+        retry = Retry(
+            total=config["retries"],
+            connect=config["retries"],
+            read=config["retries"],
+            status=config["retries"],
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            backoff_factor=0.2,
+            backoff_jitter=0.3,
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=config["pool_size"], pool_maxsize=config["pool_size"], max_retries=retry)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def get(self, url, **kwargs) -> requests.Response:
+        return self.session.get(url, **kwargs)
+
+    def post(self, url, **kwargs) -> requests.Response:
+        return self.session.post(url, **kwargs)
+
+    def _handle_error(self, error):
+        # google-auth opakowuje wyjątki requests w TransportError
+        if isinstance(error, CircuitOpenError) or isinstance(error.__cause__, CircuitOpenError):
+            return {"code": 503, "status": "Service Unavailable", "message": "External service is temporarily unavailable"}, 503, {"Retry-After": str(self.config["breaker_reset"])}
+        return {"code": 502, "status": "Bad Gateway", "message": "External service did not respond"}, 502
+
+
+http_client = OutboundClient()
@@ -0,0 +1,114 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from PIL import Image as PillowImage
+
+from db import db
+
+AVATAR_SIZES = (64, 128, 256)
+
+
+def render_avatar(source_path: str, output_dir: str, stem: str, sizes=AVATAR_SIZES) -> dict[int, int]:
+    """
+    Tworzy kwadratowe warianty avatara w formacie WEBP. Uruchamiane w osobnym procesie.
+
+    Returns:
+        dict: {rozmiar: wielkość pliku w bajtach}
+    """
+    largest = max(sizes)
+
+    with PillowImage.open(source_path) as img:
+        # dla JPEG dekoder od razu skaluje obraz (1/2, 1/4, 1/8), więc duże zdjęcia nie są wczytywane w pełnej rozdzielczości
+        img.draft("RGB", (largest, largest))
+
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+
+        width, height = img.size
+        new_edge = min(width, height)
+        left = (width - new_edge) // 2
+        top = (height - new_edge) // 2
+        img_cropped = img.crop((left, top, left + new_edge, top + new_edge))
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    sizes_in_bytes = {}
+    for size in sorted(sizes, reverse=True):
+        # reducing_gap najpierw zmniejsza obraz szybkim reduce(), a LANCZOS liczony jest już na mniejszym obrazie
+        variant = img_cropped.resize((size, size), PillowImage.LANCZOS, reducing_gap=3.0)
+        save_path = os.path.join(output_dir, f"{stem}_{size}.webp")
+        variant.save(save_path, format="WEBP")
+        sizes_in_bytes[size] = os.path.getsize(save_path)
+
+    return sizes_in_bytes
+
+
+class AvatarPipeline:
+    """
+    Przetwarzanie avatarów w puli procesów. Żądanie zapisuje tylko oryginał i rekord pliku w stanie 'processing'
+    (do tego czasu url wskazuje na domyślny avatar), a warianty 64/128/256 powstają w tle.
+    Przy AVATAR_WORKERS = 0 przetwarzanie odbywa się od razu w żądaniu.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.workers = 2
+        self._executor = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = app.config.get("AVATAR_WORKERS", 2)
+        app.extensions["avatar_pipeline"] = self
+
+    def submit(self, file):
+        """Zleca wygenerowanie wariantów dla zapisanego (po commicie) pliku"""
+        job = (file.original_path, file.images_folder, file.stem)
+
+        if not self.workers:
+            try:
+                result = render_avatar(*job)
+            except Exception as error:
+                self._finish(file.id, None, error)
+            else:
+                self._finish(file.id, result)
+            return
+
+        if self._executor is None:
+            # spawn zamiast fork, bo proces aplikacji ma już działające wątki (kolejka maili itd.)
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+        future = self._executor.submit(render_avatar, *job)
+        future.add_done_callback(partial(self._on_done, file.id))
+
+    def _on_done(self, file_id: int, future):
+        error = future.exception()
+        self._finish(file_id, None if error else future.result(), error)
+
+    def _finish(self, file_id: int, sizes_in_bytes: dict | None, error: Exception = None):
+        from generations import change_tracker
+        from models import FileModel
+
+        with self.app.app_context():
+            try:
+                file = FileModel.query.get(file_id)
+                if file is None:
+                    return
+
+                if error is not None:
+                    self.app.logger.error(f"Processing avatar {file_id} failed: {error}")
+                    file.status = "failed"
+                else:
+                    file.mark_ready(sizes_in_bytes)
+
+                # url avatara się zmienił, więc odpowiedzi z autorami są nieaktualne
+                change_tracker.bump("users")
+                db.session.commit()
+            finally:
+                db.session.remove()
+
+
+avatar_pipeline = AvatarPipeline()
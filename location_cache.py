@@ -0,0 +1,34 @@
+from cache import MemoryBackend, TTLCache
+
+
+class LocationCache:
+    """
+    Cache odpowiedzi Google Maps: podpowiedzi po tekście i komórce geohash, szczegóły miejsca po place_id
+    i adresy po komórce geohash. Rozmiar i czasy życia pochodzą z app.config, a LOCATION_CACHE_BACKEND
+    (fabryka przyjmująca max_size, domyślnie MemoryBackend) pozwala podać magazyn współdzielony między workerami.
+    """
+
+    def __init__(self, app=None):
+        self.autocomplete = None
+        self.places = None
+        self.geocode = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        max_size = app.config.get("LOCATION_CACHE_SIZE", 4096)
+        backend = app.config.get("LOCATION_CACHE_BACKEND", MemoryBackend)
+        self.autocomplete = TTLCache(ttl=app.config.get("LOCATION_AUTOCOMPLETE_TTL", 60 * 60), backend=backend(max_size))
+        self.places = TTLCache(ttl=app.config.get("LOCATION_PLACE_TTL", 24 * 60 * 60), backend=backend(max_size))
+        self.geocode = TTLCache(ttl=app.config.get("LOCATION_GEOCODE_TTL", 24 * 60 * 60), backend=backend(max_size))
+        app.extensions["location_cache"] = self
+
+    def stats(self) -> dict:
+        return {
+            "autocomplete": self.autocomplete.stats(),
+            "place_details": self.places.stats(),
+            "geocode": self.geocode.stats()
+        }
+
+
+location_cache = LocationCache()
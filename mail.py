@@ -1,3 +1,148 @@
-from flask_mail import Mail
+import os
+import threading
+from datetime import datetime, timedelta
+from functools import lru_cache
 
-mail = Mail()
\ No newline at end of file
+from flask_mail import Mail, Message
+
+from db import db
+from models.mail_outbox import MailOutboxModel
+
+mail = Mail()
+
+
+@lru_cache(maxsize=1)
+def load_logo() -> bytes:
+    with open(os.path.join("static", "mails", "logo.png"), 'rb') as logo:
+        return logo.read()
+
+
+def build_message(recipient: str, subject: str, html: str) -> Message:
+    msg = Message(subject=subject, recipients=[recipient])
+    msg.html = html
+    msg.attach("logo.png", "image/png", load_logo(), 'inline', headers={
+        "Content-ID": "<logo>",
+    })
+    return msg
+
+
+class MailQueue:
+    """
+    Kolejka maili oparta o tabelę mail_outbox. Żądanie tylko zapisuje wiadomość w tej samej transakcji,
+    a wysyłką zajmują się wątki w tle, wysyłając paczki maili jednym połączeniem SMTP i ponawiając błędy.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._wakeup = threading.Event()
+        self._workers = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.batch_size = app.config.get("MAIL_QUEUE_BATCH_SIZE", 20)
+        self.max_attempts = app.config.get("MAIL_QUEUE_MAX_ATTEMPTS", 5)
+        self.retry_delay = app.config.get("MAIL_QUEUE_RETRY_DELAY", 30)
+        self.poll_interval = app.config.get("MAIL_QUEUE_POLL_INTERVAL", 10)
+        # czas, po którym wiadomość pobrana przez worker, który w międzyczasie padł, wraca do kolejki
+        self.lease_time = app.config.get("MAIL_QUEUE_LEASE_TIME", 300)
+        app.extensions["mail_queue"] = self
+
+        for _ in range(app.config.get("MAIL_QUEUE_WORKERS", 1) - len(self._workers)):
+            worker = threading.Thread(target=self._run, name="mail-queue", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def enqueue(self, recipient: str, subject: str, html: str) -> MailOutboxModel:
+        """Dodaje maila do bieżącej sesji, zostanie wysłany po commicie (wywołaj wake() żeby nie czekać na poll)"""
+        message = MailOutboxModel(recipient=recipient, subject=subject, html=html)
+        db.session.add(message)
+        return message
+
+    def wake(self):
+        self._wakeup.set()
+
+    def flush(self) -> int:
+        """Wysyła wszystkie zaległe maile w paczkach, zwraca liczbę wysłanych. Wymaga kontekstu aplikacji."""
+        sent = 0
+        while True:
+            batch = self._claim()
+            if not batch:
+                return sent
+            sent += self._send(batch)
+
+    def _claim(self) -> list[MailOutboxModel]:
+        now = datetime.now()
+        due = (
+            MailOutboxModel.query
+            .filter(
+                MailOutboxModel.sent_at.is_(None),
+                MailOutboxModel.next_attempt_at <= now,
+                MailOutboxModel.attempts < self.max_attempts,
+            )
+            .order_by(MailOutboxModel.id)
+            .limit(self.batch_size)
+            .all()
+        )
+
+        claimed = []
+        for message in due:
+            # compare-and-swap na next_attempt_at, żeby ten sam mail nie został wysłany przez dwa workery
+            updated = MailOutboxModel.query.filter_by(id=message.id, next_attempt_at=message.next_attempt_at).update(
+                {
+                    MailOutboxModel.next_attempt_at: now + timedelta(seconds=self.lease_time),
+                    MailOutboxModel.attempts: MailOutboxModel.attempts + 1,
+                },
+                synchronize_session=False,
+            )
+            if updated:
+                claimed.append(message.id)
+        db.session.commit()
+
+        if not claimed:
+            return []
+
+        return MailOutboxModel.query.filter(MailOutboxModel.id.in_(claimed)).order_by(MailOutboxModel.id).all()
+
+    def _send(self, batch: list[MailOutboxModel]) -> int:
+        sent = 0
+        try:
+            with mail.connect() as connection:
+                for message in batch:
+                    try:
+                        connection.send(build_message(message.recipient, message.subject, message.html))
+                        message.sent_at = datetime.now()
+                        message.last_error = None
+                        sent += 1
+                    except Exception as error:
+                        self._retry_later(message, error)
+        except Exception as error:
+            # nie udało się połączyć z serwerem SMTP, cała paczka idzie do ponowienia
+            for message in batch:
+                if message.sent_at is None:
+                    self._retry_later(message, error)
+
+        db.session.commit()
+        return sent
+
+    def _retry_later(self, message: MailOutboxModel, error: Exception):
+        message.last_error = str(error)
+        message.next_attempt_at = datetime.now() + timedelta(seconds=self.retry_delay * 2 ** (message.attempts - 1))
+        self.app.logger.warning(f"Sending mail {message.id} to {message.recipient} failed (attempt {message.attempts}): {error}")
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            with self.app.app_context():
+                try:
+                    self.flush()
+                except Exception as error:
+                    db.session.rollback()
+                    self.app.logger.error(f"Mail queue worker error: {error}")
+                finally:
+                    db.session.remove()
+
+
+mail_queue = MailQueue()
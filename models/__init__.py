@@ -10,4 +10,7 @@ from models.posts_reports import PostReportModel
 from models.comments_reports import CommentReportModel
 from models.notifications import NotificationModel
 from models.password_resets import PasswordResetModel
-from models.blocked_tokens import BlockedTokenModel
\ No newline at end of file
+from models.blocked_tokens import BlockedTokenModel
+from models.mail_outbox import MailOutboxModel
+from models.schema_version import SchemaVersionModel
+from models.change_generations import ChangeGenerationModel
@@ -5,5 +5,6 @@ from db import db
 class BlockedTokenModel(db.Model):
     __tablename__ = 'blocked_tokens'
     id = db.Column(db.Integer, primary_key=True)
-    token = db.Column(db.String, nullable=False)
+    token = db.Column(db.String, nullable=False, index=True)
     blocked_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    expires_at = db.Column(db.DateTime, nullable=True, index=True)
@@ -0,0 +1,8 @@
+from db import db
+
+class ChangeGenerationModel(db.Model):
+    __tablename__ = 'change_generations'
+    name = db.Column(db.String(50), primary_key=True)
+    generation = db.Column(db.Integer, nullable=False, default=0)
+    # UTC, do nagłówka Last-Modified
+    updated_at = db.Column(db.DateTime, nullable=False)
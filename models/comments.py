@@ -1,12 +1,16 @@
 from time import sleep
 
-from sqlalchemy import event
+from sqlalchemy import event, func
 from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import joinedload
 
 from db import db
 
 class CommentModel(db.Model):
     __tablename__ = 'comments'
+    __table_args__ = (
+        db.Index('ix_comments_post_id_path', 'post_id', 'path'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
@@ -20,16 +24,107 @@ class CommentModel(db.Model):
     is_anonymous = db.Column(db.Boolean, nullable=True, default=False)
     parent_comment = db.relationship('CommentModel', remote_side=[id], back_populates='replies')
     replies = db.relationship('CommentModel', back_populates='parent_comment', lazy='dynamic')
+    replies_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     @db.ext.hybrid.hybrid_property
     def depth(self):
         return len(self.path.split('.')) if self.path else 0
 
-    @db.ext.hybrid.hybrid_property
-    def replies_count(self):
-        return CommentModel.query.filter(CommentModel.path.like(f'{self.path}.%')).count()
+    @classmethod
+    def serialization_options(cls):
+        from models import UserModel
+        return (
+            joinedload(cls.author).joinedload(UserModel.avatar),
+        )
+
+    @classmethod
+    def find_with_relations(cls, comment_id: int) -> 'CommentModel | None':
+        """
+        Komentarz z postem, autorem i rodzicem w jednym zapytaniu, a bezpośrednie odpowiedzi (w thread_replies)
+        z autorami w drugim, zamiast doczytywania każdej relacji osobno przy serializacji
+        """
+        from models import UserModel
+        comment = cls.query.options(
+            *cls.serialization_options(),
+            joinedload(cls.post),
+            joinedload(cls.parent_comment).joinedload(cls.author).joinedload(UserModel.avatar),
+        ).filter(cls.id == comment_id).first()
+
+        if comment is not None:
+            comment.thread_replies = (
+                cls.query.options(*cls.serialization_options())
+                .filter(cls.parent_comment_id == comment.id)
+                .order_by(cls.id)
+                .all()
+            )
+        return comment
+
+    @classmethod
+    def get_thread(cls, post_id: int, parent: 'CommentModel' = None, max_depth: int = None) -> list['CommentModel']:
+        """
+        Pobiera cały wątek posta (lub poddrzewo komentarza parent) jednym zapytaniem po indeksie (post_id, path)
+        i składa drzewo w pamięci. Odpowiedzi każdego węzła trafiają do thread_replies, posortowane od najstarszej.
+
+        Returns:
+            list: komentarze najwyższego poziomu wątku
+        """
+        comments = cls.query.options(*cls.serialization_options()).filter(cls.post_id == post_id)
+
+        base_depth = 0
+        if parent is not None:
+            comments = comments.filter(cls.path.like(f'{parent.path}.%'))
+            base_depth = parent.depth
+
+        if max_depth is not None:
+            dots = func.length(cls.path) - func.length(func.replace(cls.path, '.', ''))
+            comments = comments.filter(dots < base_depth + max_depth)
+
+        comments = comments.order_by(cls.path).all()
+
+        by_id = {comment.id: comment for comment in comments}
+        roots = []
+
+        for comment in comments:
+            comment.thread_replies = []
+
+        for comment in comments:
+            parent_node = by_id.get(comment.parent_comment_id)
+            if parent_node is not None:
+                parent_node.thread_replies.append(comment)
+            else:
+                roots.append(comment)
+
+        # sortowanie po path jest leksykograficzne ("1.10" < "1.9"), więc rodzeństwo układamy po id
+        roots.sort(key=lambda comment: comment.id)
+        for comment in comments:
+            comment.thread_replies.sort(key=lambda reply: reply.id)
+
+        return roots
+
+    @property
+    def ancestor_ids(self):
+        return [int(comment_id) for comment_id in self.path.split('.')[:-1]] if self.path else []
+
+    def _update_counters(self, change: int):
+        """Aktualizuje licznik komentarzy posta i liczniki odpowiedzi wszystkich przodków jednym UPDATE na tabelę"""
+        from models import PostModel
+
+        PostModel.query.filter_by(id=self.post_id).update(
+            {PostModel.comments_count: PostModel.comments_count + change}, synchronize_session=False
+        )
+
+        if self.ancestor_ids:
+            CommentModel.query.filter(CommentModel.id.in_(self.ancestor_ids)).update(
+                {CommentModel.replies_count: CommentModel.replies_count + change}, synchronize_session=False
+            )
 
     def save(self):
+        """
+        Zapisuje komentarz, jego ścieżkę, liczniki, powiadomienia i maile w jednej transakcji.
+        Powiadomienia trafiają do bazy jednym wsadowym INSERT przy commicie.
+        """
+        from generations import change_tracker
+        from mail import mail_queue
         from models import NotificationModel
         try:
             db.session.add(self)
@@ -40,15 +135,49 @@ class CommentModel(db.Model):
             else:
                 self.path = f"{self.parent_comment.path}.{self.id}"
 
+            self._update_counters(1)
+
+            # user_id może być jeszcze napisem z tokenu JWT, więc porównujemy id wczytanych autorów
+            author = self.author
+            notifications = []
+            if self.post.author_id != author.id:
+                notifications.append(NotificationModel.build(self.post, author, self.is_anonymous))
+            if self.parent_comment_id and self.parent_comment.user_id != author.id:
+                notifications.append(NotificationModel.build(self.parent_comment, author, self.is_anonymous))
+
+            db.session.add_all(notifications)
+            for notification in notifications:
+                notification.queue_mail()
+
+            change_tracker.bump("comments", "posts")
             db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise e
 
-            if self.post.author.id != self.user_id:
-                post_notification = NotificationModel.create_notification(self.post, self.user_id, self.is_anonymous)
-                post_notification.send_notification()
-            if self.parent_comment_id and (self.parent_comment.author.id != self.user_id):
-                comment_notification = NotificationModel.create_notification(self.parent_comment, self.user_id, self.is_anonymous)
-                comment_notification.send_notification()
+        if notifications:
+            mail_queue.wake()
+
+    def delete(self):
+        """Usuwa komentarz razem ze wszystkimi odpowiedziami, ich zgłoszeniami i powiadomieniami, i zmniejsza liczniki o rozmiar poddrzewa"""
+        from generations import change_tracker
+        from models import CommentReportModel, NotificationModel
+        try:
+            subtree = CommentModel.query.filter(
+                db.or_(CommentModel.id == self.id, CommentModel.path.like(f'{self.path}.%'))
+            )
+            subtree_ids = [comment_id for comment_id, in subtree.with_entities(CommentModel.id)]
 
+            self._update_counters(-len(subtree_ids))
+
+            CommentReportModel.query.filter(CommentReportModel.comment_id.in_(subtree_ids)).delete(synchronize_session=False)
+            NotificationModel.query.filter(
+                NotificationModel.subject_type == 'CommentModel', NotificationModel.subject_id.in_(subtree_ids)
+            ).delete(synchronize_session=False)
+            subtree.delete(synchronize_session=False)
+
+            change_tracker.bump("comments", "posts")
+            db.session.commit()
         except Exception as e:
             db.session.rollback()
-            raise e
\ No newline at end of file
+            raise e
@@ -1,12 +1,22 @@
+from assets import asset_url, content_hash, find_asset
 from db import db
+from http_client import http_client
 from flask_smorest import abort
 
 import magic
 from PIL import Image as PillowImage
 from uuid import uuid4
-import io, os
+import io, os, shutil, tempfile
 from flask import current_app
 
+STATIC_URL = "https://api.seegest.com/static"
+DEFAULT_AVATAR_URL = f"{STATIC_URL}/images/default_profile.webp"
+DEFAULT_AVATAR_SIZE = 128
+AVATAR_MIME_TYPES = ("image/png", "image/jpeg", "image/webp", "image/jpg")
+# libmagic rozpoznaje obrazy po nagłówku, więcej nie trzeba wczytywać
+SNIFF_BYTES = 2048
+CHUNK_SIZE = 64 * 1024
+
 class FileModel(db.Model):
     __tablename__ = 'files'
 
@@ -16,42 +26,119 @@ class FileModel(db.Model):
     upload_date = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
     mime_type = db.Column(db.String(50), nullable=False)
     size = db.Column(db.Integer, nullable=False)
+    # processing - oryginał czeka na przetworzenie, url wskazuje wtedy na domyślny avatar
+    status = db.Column(db.String(20), nullable=False, default='ready', server_default='ready')
+    variant_sizes = db.Column(db.String(50), nullable=True)
+    # skróty zawartości do adresów /assets/<hash>/<nazwa>, variant_hashes w kolejności variant_sizes
+    content_hash = db.Column(db.String(16), nullable=True)
+    variant_hashes = db.Column(db.String(100), nullable=True)
 
-    @classmethod
-    def save_avatar(cls, file_stream: io.BytesIO):
-        if (magic.from_buffer(file_stream.read(), mime=True) not in (
-        "image/png", "image/jpeg", "image/webp", "image/jpg")):
-            abort(400, message="Invalid image format, available formats: png, jpg, jpeg, webp")
+    @property
+    def stem(self):
+        # starsze pliki mają nazwę <uuid>.webp, nowe <uuid>_<rozmiar>.webp
+        return self.filename.rsplit('.', 1)[0].rsplit('_', 1)[0]
+
+    @property
+    def images_folder(self):
+        return os.path.join(current_app.root_path, "static", "images")
+
+    @property
+    def original_path(self):
+        # oryginały trzymamy poza static, bo mogą zawierać metadane (np. lokalizację z EXIF)
+        return os.path.join(current_app.instance_path, "avatars", self.stem)
+
+    @property
+    def variants(self):
+        if not self.variant_sizes:
+            return {}
+        sizes = self.variant_sizes.split(',')
+        if not self.variant_hashes:
+            return {size: f"{STATIC_URL}/images/{self.stem}_{size}.webp" for size in sizes}
+        return {size: asset_url(digest, f"{self.stem}_{size}.webp") for size, digest in zip(sizes, self.variant_hashes.split(','))}
+
+    def mark_ready(self, sizes_in_bytes: dict):
+        self.status = 'ready'
+        self.variant_sizes = ','.join(str(size) for size in sorted(sizes_in_bytes))
+        self.size = sizes_in_bytes[DEFAULT_AVATAR_SIZE]
+        self.refresh_hashes()
 
-        file_stream = file_stream
+    def refresh_hashes(self):
+        """Liczy skróty plików z dysku i przestawia url (i warianty) na niezmienne adresy /assets/<hash>/..."""
+        if self.variant_sizes:
+            self.variant_hashes = ','.join(
+                content_hash([os.path.join(self.images_folder, f"{self.stem}_{size}.webp")]) for size in self.variant_sizes.split(',')
+            )
 
-        img = PillowImage.open(file_stream)  # Pillow obsługuje bezpośrednio strumienie
+        path = find_asset(self.filename)
+        if path is not None:
+            self.content_hash = content_hash([path])
+            self.url = asset_url(self.content_hash, self.filename)
 
-        img.convert("RGB")
+    def remove_files(self):
+        """Usuwa z dysku plik razem z wariantami i oryginałem"""
+        paths = [os.path.join(self.images_folder, self.filename), self.original_path]
+        paths += [os.path.join(self.images_folder, f"{self.stem}_{size}.webp") for size in self.variants]
 
-        width, height = img.size
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
 
-        new_edge = min(width, height)
+    @classmethod
+    def save_avatar(cls, file_stream: io.RawIOBase):
+        """
+        Sprawdza i zapisuje oryginał avatara. Zwrócony rekord ma status 'processing',
+        po commicie trzeba go przekazać do avatar_pipeline.submit(), który wygeneruje warianty.
+
+        Strumień czytany jest kawałkami do AVATAR_MAX_BYTES (dalej 413), a powyżej AVATAR_SPOOL_BYTES
+        trafia do pliku tymczasowego, więc w pamięci nigdy nie ląduje cały upload.
+        """
+        max_bytes = current_app.config.get("AVATAR_MAX_BYTES", 10 * 1024 * 1024)
+        max_pixels = current_app.config.get("AVATAR_MAX_PIXELS", 40_000_000)
+
+        head = file_stream.read(SNIFF_BYTES)
+        if magic.from_buffer(head, mime=True) not in AVATAR_MIME_TYPES:
+            abort(400, message="Invalid image format, available formats: png, jpg, jpeg, webp")
 
-        left = (width - new_edge) // 2
-        top = (height - new_edge) // 2
-        right = left + new_edge
-        bottom = top + new_edge
+        with tempfile.SpooledTemporaryFile(max_size=current_app.config.get("AVATAR_SPOOL_BYTES", 1024 * 1024)) as spool:
+            spool.write(head)
+            size = len(head)
+            while chunk := file_stream.read(CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    abort(413, message=f"Image is too large, maximum size is {max_bytes // (1024 * 1024)} MB")
+                spool.write(chunk)
 
-        img_cropped = img.crop((left, top, right, bottom))
+            # Pillow przy open() czyta tylko nagłówek, więc wymiary sprawdzamy zanim ktokolwiek zdekoduje piksele
+            spool.seek(0)
+            try:
+                with PillowImage.open(spool) as img:
+                    width, height = img.size
+            except (PillowImage.DecompressionBombError, OSError):
+                abort(400, message="Invalid image file")
+            if width * height > max_pixels:
+                abort(413, message=f"Image dimensions are too large, maximum is {max_pixels} pixels")
 
-        # Skalowanie do 128x128
-        img_resized = img_cropped.resize((128, 128), PillowImage.LANCZOS)
-        
-        static_folder = os.path.join(current_app.root_path, "static", "images")
+            stem = uuid4().hex
+            originals_folder = os.path.join(current_app.instance_path, "avatars")
+            os.makedirs(originals_folder, exist_ok=True)
 
-        filename = uuid4().hex + ".webp"
-        os.makedirs(static_folder, exist_ok=True)
+            spool.seek(0)
+            with open(os.path.join(originals_folder, stem), "wb") as original:
+                shutil.copyfileobj(spool, original, CHUNK_SIZE)
+
+        return cls(filename=f"{stem}_{DEFAULT_AVATAR_SIZE}.webp", url=DEFAULT_AVATAR_URL, mime_type="image/webp",
+                   size=size, status='processing')
+
+    @classmethod
+    def save_remote_avatar(cls, url: str):
+        """Pobiera avatar (np. z Google albo Facebooka) strumieniowo, z tymi samymi limitami co upload"""
+        max_bytes = current_app.config.get("AVATAR_MAX_BYTES", 10 * 1024 * 1024)
 
-        save_path = os.path.join(static_folder, filename)
-        img_resized.save(save_path, format="WEBP")
+        with http_client.get(url, stream=True) as response:
+            if not response.ok:
+                abort(502, message="Could not download profile picture")
+            if int(response.headers.get("Content-Length") or 0) > max_bytes:
+                abort(413, message=f"Image is too large, maximum size is {max_bytes // (1024 * 1024)} MB")
 
-        return  cls(filename=filename, url=f"https://api.seegest.com/static/images/{filename}", mime_type="image/webp",
-                               size=os.path.getsize(save_path))
-    
-    
+            response.raw.decode_content = True
+            return cls.save_avatar(response.raw)
@@ -1,17 +1,21 @@
-import os
+from collections import defaultdict
 
 from flask import render_template
-from flask_mail import Message
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy_utils import generic_relationship
 from sqlalchemy import func
+from sqlalchemy.orm import joinedload
 
 from db import db
-from mail import mail
+from mail import mail_queue
 
 
 class NotificationModel(db.Model):
     __tablename__ = 'notifications'
+    __table_args__ = (
+        # licznik nieprzeczytanych i lista użytkownika czytane są wprost z indeksu
+        db.Index('ix_notifications_user_id_is_read_created_at', 'user_id', 'is_read', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
 
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
@@ -32,31 +36,44 @@ class NotificationModel(db.Model):
         return f"{'Anonimowy Użytkownik' if self.is_responder_anonymous else f'Użytkownik {self.responder.name}'} {'skomentował twój Post' if self.subject_type == 'PostModel' else 'odpowiedział na twój Komentarz'}!"
 
     @classmethod
-    def create_notification(cls, subject: db.Model, responder_id: db.Integer, is_annonymous: bool = False):
-        subject_type = subject.__class__.__name__
-
-        if subject_type == 'PostModel':
-            notification = cls(user_id=subject.author_id, responder_id=responder_id, subject=subject, is_responder_anonymous=is_annonymous)
-            db.session.add(notification)
-            db.session.commit()
+    def serialization_options(cls):
+        from models import UserModel
+        return (
+            joinedload(cls.responder).joinedload(UserModel.avatar),
+        )
 
-            return notification
-        elif subject_type == 'CommentModel':
-            notification = cls(user_id=subject.user_id, responder_id=responder_id, subject=subject, is_responder_anonymous=is_annonymous)
-            db.session.add(notification)
-            db.session.commit()
+    @classmethod
+    def prefetch_subjects(cls, notifications: list['NotificationModel']):
+        """Wczytuje przedmioty powiadomień jednym zapytaniem na typ i podpina je pod generic_relationship"""
+        from models import PostModel, CommentModel
+
+        ids_by_type = defaultdict(set)
+        for notification in notifications:
+            ids_by_type[notification.subject_type].add(notification.subject_id)
+
+        subjects = {}
+        for model in (PostModel, CommentModel):
+            if ids_by_type.get(model.__name__):
+                for subject in model.query.filter(model.id.in_(ids_by_type[model.__name__])):
+                    subjects[(model.__name__, subject.id)] = subject
+
+        for notification in notifications:
+            subject = subjects.get((notification.subject_type, notification.subject_id))
+            if subject is not None:
+                # te same wartości typu i id, więc przy flushu nie powstaje UPDATE
+                notification.subject = subject
 
-            return notification
-        else:
+    @classmethod
+    def build(cls, subject: db.Model, responder: db.Model, is_anonymous: bool = False):
+        """Tworzy powiadomienie dla autora subject bez zapisu, relacje ustawiamy obiektami, żeby mail nie musiał ich doczytywać"""
+        if subject.__class__.__name__ not in ('PostModel', 'CommentModel'):
             raise Exception(f"Unsupported subject type: {type(subject)}")
 
-    def send_notification(self):
-        print(f"Sending notification at {self.user.email}")
+        return cls(user=subject.author, responder=responder, subject=subject, is_responder_anonymous=is_anonymous)
 
-        msg = Message(
-            subject=f"Masz {'nową opowiedź na twój komentarz' if self.subject_type == 'CommentModel' else 'komentarz pod twoim postem'} na seegest.com",
-            recipients=[self.user.email],
-        )
+    def queue_mail(self):
+        """Dodaje maila z powiadomieniem do bieżącej transakcji, bez commita"""
+        subject = f"Masz {'nową opowiedź na twój komentarz' if self.subject_type == 'CommentModel' else 'komentarz pod twoim postem'} na seegest.com"
 
         responder_name = "anonimowy użytkownik" if self.is_responder_anonymous else self.responder.name
 
@@ -79,8 +96,5 @@ class NotificationModel(db.Model):
                 'user_name': self.user.name,
             }
 
-        msg.html = render_template("notification.html", title="Notification message", **mail_data)
-        msg.attach("logo.png", "image/png", open(os.path.join("static", "mails", "logo.png"), 'rb').read(), 'inline', headers={
-            "Content-ID": "<logo>",
-        })
-        mail.send(msg)
\ No newline at end of file
+        html = render_template("notification.html", title="Notification message", **mail_data)
+        mail_queue.enqueue(self.user.email, subject, html)
\ No newline at end of file
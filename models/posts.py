@@ -1,31 +1,80 @@
 from datetime import datetime
 from math import acos, radians, sin, cos, atan2, sqrt
 
-from sqlalchemy import func
+from sqlalchemy import func, event, or_, and_
+from sqlalchemy.orm import joinedload, selectinload
 from sqlalchemy.ext.hybrid import hybrid_method, hybrid_property
 from sqlalchemy.util import hybridmethod
 
 from db import db
+from geo import EARTH_RADIUS_KM, encode_geohash, bounding_box, covering_cells
 from models.comments import CommentModel
+from models.icons import IconsModel
+from models.users import UserModel
 
 
 class PostModel(db.Model):
     __tablename__ = 'posts'
 
     id = db.Column(db.Integer, primary_key=True)
-    created_at = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
+    created_at = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp(), index=True)
     title = db.Column(db.String, nullable=False)
     content = db.Column(db.Text, nullable=False)
     icon_id = db.Column(db.Integer, db.ForeignKey('icons.id'), nullable=False)
     icon = db.relationship('IconsModel')
-    tags = db.relationship('TagsModel', secondary='posts_tags', back_populates='posts', lazy='dynamic')
+    tags = db.relationship('TagsModel', secondary='posts_tags', back_populates='posts')
     comments = db.relationship('CommentModel', back_populates='post', lazy='dynamic')
     author_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     author = db.relationship('UserModel', back_populates='posts')
-    latitude = db.Column(db.Float, nullable=False)
+    latitude = db.Column(db.Float, nullable=False, index=True)
     longitude = db.Column(db.Float, nullable=False)
+    geohash = db.Column(db.String(12), index=True)
     location = db.Column(db.String, nullable=False)
     is_anonymous = db.Column(db.Boolean, nullable=True, default=False)
+    comments_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    @classmethod
+    def serialization_options(cls):
+        """
+        Plan ładowania wszystkiego czego potrzebuje PostSchema: relacje many-to-one dołączane w tym samym
+        zapytaniu, tagi jednym dodatkowym SELECT ... IN, niezależnie od liczby postów
+        """
+        return (
+            joinedload(cls.icon).joinedload(IconsModel.file),
+            joinedload(cls.author).joinedload(UserModel.avatar),
+            selectinload(cls.tags),
+        )
+
+    @classmethod
+    def having_all_tags(cls, tags_ids):
+        """Warunek na posty oznaczone wszystkimi podanymi tagami, jako podzapytanie żeby główne zapytanie nie wymagało GROUP BY"""
+        from models import PostsTagsModel
+
+        tagged_posts = (
+            db.select(PostsTagsModel.post_id)
+            .where(PostsTagsModel.tag_id.in_(tags_ids))
+            .group_by(PostsTagsModel.post_id)
+            .having(func.count(PostsTagsModel.tag_id) == len(tags_ids))
+        )
+
+        return cls.id.in_(tagged_posts)
+
+    def delete_dependents(self):
+        """
+        Usuwa komentarze posta razem z ich zgłoszeniami, powiadomienia o poście i jego komentarzach oraz zgłoszenia posta,
+        po jednym DELETE na tabelę, bez commita. Inaczej usunięcie posta próbowałoby wyzerować comments.post_id.
+        """
+        from models import CommentReportModel, NotificationModel, PostReportModel
+
+        comment_ids = db.select(CommentModel.id).where(CommentModel.post_id == self.id)
+
+        CommentReportModel.query.filter(CommentReportModel.comment_id.in_(comment_ids)).delete(synchronize_session=False)
+        NotificationModel.query.filter(or_(
+            and_(NotificationModel.subject_type == 'PostModel', NotificationModel.subject_id == self.id),
+            and_(NotificationModel.subject_type == 'CommentModel', NotificationModel.subject_id.in_(comment_ids)),
+        )).delete(synchronize_session=False)
+        CommentModel.query.filter(CommentModel.post_id == self.id).delete(synchronize_session=False)
+        PostReportModel.query.filter(PostReportModel.post_id == self.id).delete(synchronize_session=False)
 
     @hybrid_method
     def distance_to(self, lat, lon):
@@ -37,15 +86,10 @@ class PostModel(db.Model):
         c = 2 * atan2(sqrt(a), sqrt(1-a))
         return radius_km * c
 
-    @hybrid_property
-    def comments_count(self):
-        return CommentModel.query.filter_by(post_id=self.id).count()
-
-
     @distance_to.expression
     def distance_to(cls, lat, lon):
         # Implementacja SQL wzoru haversine
-        radius = 6371  # km
+        radius = EARTH_RADIUS_KM
 
         lat = func.radians(lat)
         lon = func.radians(lon)
@@ -61,4 +105,32 @@ class PostModel(db.Model):
 
         c = 2 * func.asin(func.sqrt(a))
 
-        return radius * c
\ No newline at end of file
+        return radius * c
+
+    @classmethod
+    def within_radius(cls, lat, lon, radius_km):
+        """
+        Warunek ograniczający posty do okręgu o promieniu radius_km.
+        Najpierw zawężamy kandydatów po prefiksach geohasha i prostokącie (oba korzystają z indeksów),
+        dopiero na nich liczony jest dokładny haversine.
+        """
+        min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+        conditions = [cls.latitude.between(min_lat, max_lat)]
+
+        if min_lon is not None and min_lon >= -180 and max_lon <= 180:
+            conditions.append(cls.longitude.between(min_lon, max_lon))
+
+        cells = covering_cells(lat, lon, radius_km)
+        if cells:
+            # geohash >= prefix AND geohash < prefix + '~' to zakres po indeksie, w przeciwieństwie do LIKE
+            conditions.append(or_(*[and_(cls.geohash >= cell, cls.geohash < cell + '~') for cell in cells]))
+
+        conditions.append(cls.distance_to(lat, lon) <= radius_km)
+
+        return and_(*conditions)
+
+
+@event.listens_for(PostModel, 'before_insert')
+@event.listens_for(PostModel, 'before_update')
+def update_geohash(mapper, connection, target):
+    target.geohash = encode_geohash(target.latitude, target.longitude)
\ No newline at end of file
@@ -1,3 +1,5 @@
+from sqlalchemy import func, select, update
+
 from db import db
 
 class TagsModel(db.Model):
@@ -8,3 +10,38 @@ class TagsModel(db.Model):
     posts = db.relationship('PostModel', secondary="posts_tags", back_populates='tags', lazy='dynamic')
     count = db.Column(db.Integer, nullable=False, default=0)
 
+    @classmethod
+    def find_all(cls, tag_ids) -> dict:
+        """{id: tag} dla podanych id jednym zapytaniem IN, brakujących id nie ma w wyniku"""
+        if not tag_ids:
+            return {}
+        return {tag.id: tag for tag in cls.query.filter(cls.id.in_(tag_ids))}
+
+    @classmethod
+    def adjust_counts(cls, tag_ids, delta: int):
+        """
+        count = count + delta liczone w bazie jednym UPDATE, więc równoległe żądania nie nadpisują sobie wartości.
+        Wczytane obiekty mają nieaktualny count do commitu (po nim i tak są odświeżane).
+        """
+        if not tag_ids:
+            return
+        db.session.execute(
+            update(cls).where(cls.id.in_(tag_ids)).values(count=cls.count + delta).execution_options(synchronize_session=False)
+        )
+
+    @classmethod
+    def reconcile_counts(cls) -> int:
+        """Przelicza count z posts_tags jednym zapytaniem grupującym i poprawia tylko rozbieżne tagi. Zwraca ich liczbę."""
+        from models import PostsTagsModel
+
+        actual = dict(db.session.execute(
+            select(PostsTagsModel.tag_id, func.count(PostsTagsModel.id)).group_by(PostsTagsModel.tag_id)
+        ).all())
+        fixes = [
+            {"id": tag_id, "count": actual.get(tag_id, 0)}
+            for tag_id, count in db.session.execute(select(cls.id, cls.count))
+            if count != actual.get(tag_id, 0)
+        ]
+        if fixes:
+            db.session.execute(update(cls), fixes)
+        return len(fixes)
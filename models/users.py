@@ -19,4 +19,9 @@ class UserModel(db.Model):
     google_user_id = db.Column(db.Integer, index=True)
     facebook_user_id = db.Column(db.Integer, index=True)
     is_admin = db.Column(db.Boolean, nullable=False, default=False)
-    is_super_admin = db.Column(db.Boolean, nullable=False, default=False)
\ No newline at end of file
+    is_super_admin = db.Column(db.Boolean, nullable=False, default=False)
+
+    @property
+    def posts_with_details(self):
+        from models import PostModel
+        return self.posts.options(*PostModel.serialization_options()).all()
@@ -0,0 +1,142 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from flask_smorest import abort
+from sqlalchemy import DateTime, Integer, Numeric, String, and_, or_, type_coerce
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    raise TypeError(f"Cannot encode {type(value)} in cursor")
+
+
+def _decode_value(value: dict):
+    if "$dt" in value:
+        return datetime.fromisoformat(value["$dt"])
+    return value
+
+
+def encode_cursor(values) -> str:
+    raw = json.dumps(list(values), default=_encode_value, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw, object_hook=_decode_value)
+    except (binascii.Error, TypeError, ValueError):
+        abort(400, message="Invalid cursor")
+
+    if not isinstance(values, list):
+        abort(400, message="Invalid cursor")
+
+    return values
+
+
+def page_size(limit: int | None) -> int:
+    if not limit:
+        return DEFAULT_PAGE_SIZE
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def _cursor_key(key, dialect_name: str):
+    """
+    SQLite trzyma daty jako tekst i tak je porównuje, a current_timestamp zapisuje bez mikrosekund.
+    Data z kursora przekazana jako datetime ma zawsze mikrosekundy, więc wiersz z kursora spełniał warunek
+    i ta sama strona wracała w kółko. Na SQLite kursor niesie więc datę w zapisanej postaci i porównujemy
+    tekst z tekstem. type_coerce nie zmienia SQL, więc indeks dalej działa.
+    """
+    if dialect_name == "sqlite" and isinstance(key.type, DateTime):
+        return type_coerce(key, String)
+    return key
+
+
+def _valid_value(key, value) -> bool:
+    """Czy wartość z kursora ma typ pasujący do kolumny klucza"""
+    if value is None or isinstance(value, bool):
+        return False
+    if isinstance(key.type, (Integer, Numeric)):
+        return isinstance(value, (int, float))
+    if isinstance(key.type, DateTime):
+        return isinstance(value, datetime)
+    if isinstance(key.type, String):
+        return isinstance(value, str)
+    return isinstance(value, (int, float, str, datetime))
+
+
+def _after(keys, values, descending: bool):
+    """Buduje warunek (k1, k2, ...) > (v1, v2, ...) bez porównania krotek, którego SQLite nie wspiera wszędzie"""
+    key, value = keys[0], values[0]
+    beyond = key < value if descending else key > value
+
+    if len(keys) == 1:
+        return beyond
+
+    return or_(beyond, and_(key == value, _after(keys[1:], values[1:], descending)))
+
+
+def paginate(query, keys, cursor: str | None = None, limit: int | None = None, descending: bool = False):
+    """
+    Stronicowanie po kluczu (keyset). Klucze to kolumny lub wyrażenia, ostatni powinien być unikalny (np. id).
+    Wartości kluczy są pobierane razem z wierszami, więc kursor zawsze odpowiada temu co policzyła baza.
+
+    Wartości z kursora muszą mieć typ kolumn kluczy, inaczej odpowiadamy 400.
+
+    Returns:
+        tuple: (lista obiektów, kursor następnej strony lub None)
+    """
+    size = page_size(limit)
+    keys = [_cursor_key(key, query.session.get_bind().dialect.name) for key in keys]
+
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(keys) or not all(_valid_value(key, value) for key, value in zip(keys, values)):
+            abort(400, message="Invalid cursor")
+        query = query.filter(_after(keys, values, descending))
+
+    rows = (
+        query
+        .add_columns(*[key.label(f"cursor_key_{index}") for index, key in enumerate(keys)])
+        .order_by(None)
+        .order_by(*[key.desc() if descending else key.asc() for key in keys])
+        .limit(size + 1)
+        .all()
+    )
+
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode_cursor(rows[-1][1:])
+
+    return [row[0] for row in rows], next_cursor
+
+
+def paginate_sorted(items: list, key, cursor: str | None = None, limit: int | None = None):
+    """Odpowiednik paginate dla listy już posortowanej rosnąco po key(item), np. drzewa złożonego w pamięci"""
+    size = page_size(limit)
+
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != 1 or (items and type(values[0]) is not type(key(items[0]))):
+            abort(400, message="Invalid cursor")
+        items = [item for item in items if key(item) > values[0]]
+
+    next_cursor = None
+    if len(items) > size:
+        items = items[:size]
+        next_cursor = encode_cursor([key(items[-1])])
+
+    return items, next_cursor
+
+
+def cursor_headers(next_cursor: str | None) -> dict:
+    return {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
@@ -0,0 +1,55 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+from flask_smorest import abort
+
+
+class PasswordHasher:
+    """
+    Hashowanie haseł bcryptem w osobnej, ograniczonej puli wątków (bcrypt zwalnia GIL na czas liczenia).
+    Gdy w kolejce czeka więcej niż BCRYPT_MAX_QUEUE zadań, żądanie dostaje od razu 503 zamiast
+    blokować worker, więc seria logowań nie zagłodzi pozostałych endpointów.
+    """
+
+    def __init__(self, app=None):
+        self.rounds = 12
+        self._executor = None
+        self._slots = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.rounds = app.config.get("BCRYPT_LOG_ROUNDS", 12)
+        workers = app.config.get("BCRYPT_WORKERS") or os.cpu_count() or 1
+        max_queue = app.config.get("BCRYPT_MAX_QUEUE", workers * 4)
+        app.extensions["password_hasher"] = self
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+            self._slots = threading.BoundedSemaphore(workers + max_queue)
+
+    def hash(self, password: str) -> str:
+        return self._run(bcrypt.hashpw, password.encode("utf-8"), bcrypt.gensalt(self.rounds)).decode("utf-8")
+
+    def check(self, password: str, password_hash: str) -> bool:
+        return self._run(bcrypt.checkpw, password.encode("utf-8"), password_hash.encode("utf-8"))
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """Czy hash został policzony z innym kosztem niż obecnie skonfigurowany ($2b$<koszt>$...)"""
+        try:
+            return int(password_hash.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def _run(self, function, *args):
+        if not self._slots.acquire(blocking=False):
+            abort(503, message="Server is busy, please try again later", headers={"Retry-After": "1"})
+        try:
+            return self._executor.submit(function, *args).result()
+        finally:
+            self._slots.release()
+
+
+password_hasher = PasswordHasher()
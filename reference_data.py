@@ -0,0 +1,36 @@
+from flask import current_app
+
+from cache import TTLCache
+
+
+class ReferenceDataCache:
+    """
+    Gotowe odpowiedzi JSON (bajty) dla rzadko zmienianych danych: listy ikon i najpopularniejszych tagów.
+    Zamiast zapytania i serializacji przy każdym żądaniu oddajemy zapamiętaną treść.
+
+    Klucz zawiera generację z change_tracker, więc zmiana w innym procesie też trafia do nowego wpisu.
+    Zapisy w tym procesie czyszczą cache od razu przez invalidate(), a stare wpisy wygasają po REFERENCE_CACHE_TTL.
+    """
+
+    def __init__(self, app=None):
+        self.cache = TTLCache(max_size=256, ttl=300)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.cache = TTLCache(max_size=256, ttl=app.config.get("REFERENCE_CACHE_TTL", 300))
+        app.extensions["reference_data"] = self
+
+    def response(self, key, load, schema):
+        """Odpowiedź z cache albo load() zserializowane przez schema, tak samo jak zrobiłby to @blp.response"""
+        body = self.cache.get(key)
+        if body is None:
+            body = current_app.json.response(schema.dump(load())).get_data()
+            self.cache.set(key, body)
+        return current_app.response_class(body, mimetype=current_app.json.mimetype)
+
+    def invalidate(self):
+        self.cache.clear()
+
+
+reference_data = ReferenceDataCache()
@@ -3,8 +3,10 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from flask_smorest import Blueprint, abort
 
 from db import db
+from generations import change_tracker
 from models import CommentModel, PostModel, UserModel
-from schemas import CommentSchema, PlainCommentSchema
+from pagination import paginate, paginate_sorted, cursor_headers, page_size
+from schemas import CommentSchema, CommentDetailSchema, PlainCommentSchema, PaginationSchema, CommentTreeSchema, CommentTreeQuerySchema
 
 blp = Blueprint('comment', __name__)
 
@@ -46,16 +48,61 @@ class Comments(MethodView):
 
 @blp.route('/post/<int:post_id>/comments')
 class PostComments(MethodView):
+    @change_tracker.conditional("comments", "posts", "users")
+    @blp.arguments(PaginationSchema(), location='query')
     @blp.response(200, CommentSchema(many=True, exclude=["post", "replies", "parent_comment"]))
-    def get(self, post_id):
-        comments = CommentModel.query.filter_by(post_id=post_id, parent_comment_id=None).all()
-        return comments
+    def get(self, pagination_data, post_id):
+        comments = CommentModel.query.options(*CommentModel.serialization_options()).filter_by(post_id=post_id, parent_comment_id=None)
+        comments, next_cursor = paginate(comments, (CommentModel.id,), **pagination_data)
+        return comments, 200, cursor_headers(next_cursor)
+
+@blp.route('/post/<int:post_id>/comment-tree')
+class PostCommentTree(MethodView):
+    @change_tracker.conditional("comments", "posts", "users")
+    @blp.arguments(CommentTreeQuerySchema(), location='query')
+    @blp.response(200, CommentTreeSchema(many=True, exclude=["post", "parent_comment"]))
+    def get(self, tree_data, post_id):
+        parent = None
+        if tree_data.get('parent_id') is not None:
+            parent = CommentModel.query.get(tree_data['parent_id'])
+            if parent is None or parent.post_id != post_id:
+                abort(404, message='Parent comment not found')
+
+        roots = CommentModel.get_thread(post_id, parent, tree_data.get('max_depth'))
+        roots, next_cursor = paginate_sorted(roots, lambda comment: comment.id, tree_data.get('cursor'), tree_data.get('limit'))
+
+        # na głębszych poziomach zwracamy tylko pierwszą stronę, kolejne można pobrać przez parent_id
+        replies_limit = page_size(tree_data.get('limit'))
+        level = roots
+        while level:
+            next_level = []
+            for comment in level:
+                comment.thread_replies = comment.thread_replies[:replies_limit]
+                next_level.extend(comment.thread_replies)
+            level = next_level
+
+        return roots, 200, cursor_headers(next_cursor)
 
 @blp.route('/comment/<int:comment_id>')
 class Comment(MethodView):
-    @blp.response(200, CommentSchema())
+    @change_tracker.conditional("comments", "posts", "users")
+    @blp.response(200, CommentDetailSchema())
     def get(self, comment_id):
-        comment = CommentModel.query.get(comment_id)
+        comment = CommentModel.find_with_relations(comment_id)
         if comment is None:
             abort(404, message='Comment not found')
         return comment
+
+    @jwt_required()
+    @blp.response(200)
+    def delete(self, comment_id):
+        comment = CommentModel.query.get_or_404(comment_id)
+        user = UserModel.query.get(get_jwt_identity())
+        if comment.user_id != user.id and not (user.is_admin or user.is_super_admin):
+            abort(403, message="You are not authorized to perform this action")
+
+        comment.delete()
+
+        return {
+            "message": f"Comment {comment_id} deleted",
+        }
@@ -5,7 +5,9 @@ from flask_smorest import abort, Blueprint
 from sqlalchemy.exc import SQLAlchemyError
 
 from db import db
+from generations import change_tracker
 from models import FileModel, UserModel
+from reference_data import reference_data
 from schemas import PlainFileSchema
 import os
 
@@ -30,10 +32,12 @@ class File(MethodView):
             user = UserModel.query.filter_by(avatar_id=file_id).first()
             if user is not None:
                 user.avatar_id = 1
-            os.remove(os.path.join("static", "images", file.filename))
+            file.remove_files()
             db.session.add(user)
             db.session.delete(file)
+            change_tracker.bump("users", "icons")
             db.session.commit()
+            reference_data.invalidate()
         except SQLAlchemyError:
             db.session.rollback()
             abort(500, message=f"Something went wrong when trying to delete file {file_id}")
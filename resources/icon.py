@@ -1,24 +1,35 @@
 from flask_smorest import Blueprint, abort
 from flask.views import MethodView
+from sqlalchemy.orm import joinedload
 
 from db import db
+from generations import change_tracker
 from models import IconsModel
+from reference_data import reference_data
 from schemas import IconSchema
 
 blp = Blueprint("icons", __name__)
 
+icons_schema = IconSchema(many=True)
+
 @blp.route("/icons")
 class Icons(MethodView):
 
-    @blp.response(200, IconSchema(many=True))
+    @change_tracker.conditional("icons")
+    @blp.response(200, icons_schema)
     def get(self):
-        return IconsModel.query.all()
+        def load():
+            return IconsModel.query.options(joinedload(IconsModel.file)).all()
+
+        return reference_data.response(("icons", change_tracker.generation("icons")), load, icons_schema)
 
     @blp.arguments(IconSchema())
     @blp.response(201, IconSchema())
     def post(self, icon_data):
         icon = IconsModel(**icon_data)
         db.session.add(icon)
+        change_tracker.bump("icons")
         db.session.commit()
+        reference_data.invalidate()
 
         return icon, 201
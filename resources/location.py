@@ -4,16 +4,28 @@ import uuid
 
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from flask_smorest import Blueprint, abort
-import requests
 from flask.views import MethodView
 from flask_cors import cross_origin
 
 from db import db
-from models import SessionsModel
+from geo import encode_geohash
+from http_client import http_client
+from location_cache import location_cache
+from models import SessionsModel, UserModel
 from schemas import LocationAutocompleteSchema, LocationSearchSchema, DecodeLocationSchema
 
 blp = Blueprint('location', __name__)
 
+# Odpowiedzi Google dla popularnych miejsc powtarzają się, więc trzymamy je w location_cache:
+# podpowiedzi po tekście i komórce geohash (7 znaków ~ 150 m, mniej niż promień locationBias),
+# szczegóły miejsca po place_id, a adresy po komórce 8 znaków (~ 40 m)
+AUTOCOMPLETE_CELL_PRECISION = 7
+GEOCODE_CELL_PRECISION = 8
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
 @blp.route('/location-autocomplete')
 class LocationAutocomplete(MethodView):
     @jwt_required()
@@ -27,7 +39,10 @@ class LocationAutocomplete(MethodView):
             db.session.add(session)
             db.session.commit()
 
-        print(os.environ.get('GOOGLE_API_KEY'))
+        cache_key = (normalize_query(search_data['query']), encode_geohash(search_data['latitude'], search_data['longitude'], AUTOCOMPLETE_CELL_PRECISION))
+        cached = location_cache.autocomplete.get(cache_key)
+        if cached is not None:
+            return cached
 
         request_data = {
             "input": search_data['query'],
@@ -50,10 +65,10 @@ class LocationAutocomplete(MethodView):
             "X-Goog-FieldMask": "suggestions.placePrediction.placeId,suggestions.placePrediction.structuredFormat.mainText.text,suggestions.placePrediction.structuredFormat.secondaryText.text"
         }
 
-        print(request_data)
-        print(request_headers)
+        response = http_client.post("https://places.googleapis.com/v1/places:autocomplete", headers=request_headers, json=request_data)
 
-        response = requests.post("https://places.googleapis.com/v1/places:autocomplete", headers=request_headers, json=request_data)
+        if response.status_code == 200:
+            location_cache.autocomplete.set(cache_key, response.json())
 
         return response.json()
 
@@ -69,6 +84,13 @@ class SearchLocation(MethodView):
         if session is None:
             abort(400, message="you cant search location without session you can only start session buy using autocomplete endpoint")
 
+        cached = location_cache.places.get(search_data['place_id'])
+        if cached is not None:
+            # sesja i tak się kończy, kolejne podpowiedzi dostaną nowy token
+            db.session.delete(session)
+            db.session.commit()
+            return cached
+
         request_headers = {
             "Content-Type": "application/json",
             "X-Goog-Api-Key": os.getenv("GOOGLE_MAPS_API_KEY"),
@@ -79,9 +101,10 @@ class SearchLocation(MethodView):
             "sessionToken": str(session.session_id)
         }
 
-        response = requests.get(f"https://places.googleapis.com/v1/places/{search_data['place_id']}", params=request_params, headers=request_headers)
+        response = http_client.get(f"https://places.googleapis.com/v1/places/{search_data['place_id']}", params=request_params, headers=request_headers)
 
         if response.status_code == 200:
+            location_cache.places.set(search_data['place_id'], response.json())
             db.session.delete(session)
             db.session.commit()
 
@@ -93,20 +116,44 @@ class DecodeLocation(MethodView):
     @blp.response(200)
     @blp.arguments(DecodeLocationSchema(), location='json')
     def post(self, location_data):
+        cache_key = encode_geohash(location_data['latitude'], location_data['longitude'], GEOCODE_CELL_PRECISION)
+        formatted_address = location_cache.geocode.get(cache_key)
+        if formatted_address is not None:
+            return {
+                "formatted_address": formatted_address,
+            }
+
         request_params = {
             "key": os.getenv("GOOGLE_MAPS_API_KEY"),
             "latlng": f"{location_data['latitude']},{location_data['longitude']}",
             "language": "pl"
         }
 
-        response = requests.get(f"https://maps.googleapis.com/maps/api/geocode/json",
+        response = http_client.get(f"https://maps.googleapis.com/maps/api/geocode/json",
                                 params=request_params)
 
+        geocoding = response.json()
+        formatted_address = parse_geocoding_response(geocoding)
+        if response.status_code == 200 and geocoding.get('status') == 'OK':
+            location_cache.geocode.set(cache_key, formatted_address)
+
         return {
-            "formatted_address": parse_geocoding_response(response.json()),
+            "formatted_address": formatted_address,
         }
 
 
+@blp.route('/location-cache-stats')
+class LocationCacheStats(MethodView):
+    @jwt_required()
+    @blp.response(200)
+    def get(self):
+        user = UserModel.query.get(get_jwt_identity())
+        if user.is_admin is False and user.is_super_admin is False:
+            abort(403, message="You don't have permission to view this endpoint")
+
+        return location_cache.stats()
+
+
 def parse_geocoding_response(geocoding_response: dict) -> str:
     """
     Przetwarza odpowiedź z Google Geocoding API i zwraca czytelny opis lokalizacji.
@@ -7,24 +7,28 @@ from flask_smorest import abort, Blueprint
 
 from db import db
 from models import NotificationModel
-from schemas import NotificationSchema
+from pagination import paginate, cursor_headers
+from schemas import NotificationSchema, PaginationSchema
 
 blp = Blueprint("notification", __name__)
 
+notifications_schema = NotificationSchema(many=True)
+
 @blp.route("/notifications")
 class Notifications(MethodView):
 
     # TODO: Delete at production
-    @blp.response(200, NotificationSchema(many=True))
+    @blp.response(200, notifications_schema)
     def get(self):
-        return NotificationModel.query.all()
+        notifications = NotificationModel.query.options(*NotificationModel.serialization_options()).all()
+        NotificationModel.prefetch_subjects(notifications)
+
+        return notifications
 
     @jwt_required()
     @blp.response(200)
     def delete(self):
-        notifications = NotificationModel.query.filter_by(user_id=get_jwt_identity()).all()
-        for notification in notifications:
-            db.session.delete(notification)
+        NotificationModel.query.filter_by(user_id=get_jwt_identity()).delete(synchronize_session=False)
         db.session.commit()
 
         return {
@@ -48,14 +52,45 @@ class Notification(MethodView):
 @blp.route("/my-notifications")
 class MyNotifications(MethodView):
     @jwt_required()
-    @blp.response(200, NotificationSchema(many=True))
+    @blp.arguments(PaginationSchema(), location='query')
+    @blp.response(200, notifications_schema)
+    def get(self, pagination_data):
+        notifications = NotificationModel.query.options(*NotificationModel.serialization_options()).filter_by(user_id=get_jwt_identity())
+        notifications, next_cursor = paginate(notifications, (NotificationModel.id,), descending=True, **pagination_data)
+
+        NotificationModel.prefetch_subjects(notifications)
+        response = notifications_schema.dump(notifications)
+
+        unread_ids = [notification.id for notification in notifications if not notification.is_read]
+        if unread_ids:
+            NotificationModel.query.filter(NotificationModel.id.in_(unread_ids)).update(
+                {NotificationModel.is_read: True}, synchronize_session=False
+            )
+            db.session.commit()
+
+        return jsonify(response), 200, cursor_headers(next_cursor)
+
+@blp.route("/my-notifications/unread-count")
+class UnreadNotificationsCount(MethodView):
+    @jwt_required()
+    @blp.response(200)
     def get(self):
-        notifications = NotificationModel.query.filter_by(user_id=get_jwt_identity()).all()
+        unread = NotificationModel.query.filter_by(user_id=get_jwt_identity(), is_read=False).count()
 
-        response = NotificationSchema(many=True).dump(notifications)
-        for notification in notifications:
-            notification.is_read = True
+        return {
+            "unread": unread
+        }
 
+@blp.route("/my-notifications/mark-read")
+class MarkNotificationsRead(MethodView):
+    @jwt_required()
+    @blp.response(200)
+    def post(self):
+        NotificationModel.query.filter_by(user_id=get_jwt_identity(), is_read=False).update(
+            {NotificationModel.is_read: True}, synchronize_session=False
+        )
         db.session.commit()
 
-        return jsonify(response)
\ No newline at end of file
+        return {
+            "message": "all notifications marked as read"
+        }
\ No newline at end of file
@@ -1,5 +1,4 @@
 from calendar import monthrange
-from collections import defaultdict
 
 from sqlalchemy import func, and_
 
@@ -8,12 +7,27 @@ from flask_smorest import Blueprint, abort
 from flask.views import MethodView
 from datetime import date, timedelta, datetime
 
+from cache import TTLCache
 from db import db
+from generations import change_tracker
 from models import TagsModel, PostModel, UserModel
-from schemas import PostSchema, SearchPostSchema, PostCalendarSearchSchema, PostCalendarPreviewSchema
+from pagination import paginate, cursor_headers
+from reference_data import reference_data
+from schemas import PostSchema, SearchPostSchema, PostCalendarSearchSchema, PostCalendarPreviewSchema, PaginationSchema
+from tag_index import tag_index
 
 blp = Blueprint('posts', __name__)
 
+# podsumowania miesięcy dla kalendarza, klucz zawiera generację postów, więc zmiany z innych procesów też je unieważniają
+calendar_cache = TTLCache(max_size=1024, ttl=60)
+
+@blp.record_once
+def configure_calendar_cache(state):
+    """Rozmiar i czas życia podsumowań z app.config, ustawiane przy rejestracji blueprintu"""
+    config = state.app.config
+    calendar_cache.ttl = config.get("CALENDAR_CACHE_TTL", 60)
+    calendar_cache.backend.max_size = config.get("CALENDAR_CACHE_SIZE", 1024)
+
 @blp.route('/posts')
 class Posts(MethodView):
 
@@ -21,13 +35,14 @@ class Posts(MethodView):
     @blp.arguments(PostSchema())
     @blp.response(201, PostSchema())
     def post(self, post_data: dict):
-        tags_list = list(map(lambda tag_id: TagsModel.query.get(tag_id), post_data['tags_ids']))
+        tag_ids = list(dict.fromkeys(post_data['tags_ids']))
+        tags = TagsModel.find_all(tag_ids)
 
-        if None in tags_list:
-            abort(400, message=f"Tag with id {post_data['tags_ids'][tags_list.index(None)]} not found")
+        missing = [tag_id for tag_id in tag_ids if tag_id not in tags]
+        if missing:
+            abort(400, message=f"Tag with id {missing[0]} not found")
 
-        for tag in tags_list:
-            tag.count += 1
+        tags_list = [tags[tag_id] for tag_id in tag_ids]
 
         post = PostModel(
             title=post_data['title'],
@@ -43,15 +58,24 @@ class Posts(MethodView):
         )
 
         db.session.add(post)
+        TagsModel.adjust_counts(tag_ids, 1)
+        generations = change_tracker.bump("posts", "tags")
         db.session.commit()
 
+        # po commicie obiekty są wygaszone, jedno zapytanie odświeża wszystkie tagi naraz
+        tag_index.update(TagsModel.find_all(tag_ids).values(), generations["tags"])
+        reference_data.invalidate()
+
         return post
 
     @jwt_required()
+    @blp.arguments(PaginationSchema(), location='query')
     @blp.response(200, PostSchema(many=True))
-    def get(self):
+    def get(self, pagination_data):
+        posts = PostModel.query.options(*PostModel.serialization_options())
+        posts, next_cursor = paginate(posts, (PostModel.created_at, PostModel.id), descending=True, **pagination_data)
 
-        return PostModel.query.all()
+        return posts, 200, cursor_headers(next_cursor)
 
 @blp.route("/post/<int:post_id>")
 class Post(MethodView):
@@ -59,29 +83,34 @@ class Post(MethodView):
     @blp.response(200)
     def delete(self, post_id):
         post = PostModel.query.get_or_404(post_id)
-        if post.tags:
-            for tag in post.tags:
-                tag.count -= 1
         user = UserModel.query.get(get_jwt_identity())
-        if str(post.author_id) != user.id and not (user.is_admin or user.is_super_admin):
+        if post.author_id != user.id and not (user.is_admin or user.is_super_admin):
             abort(403, message="You are not authorized to perform this action")
+        tag_ids = [tag.id for tag in post.tags]
+        post.delete_dependents()
         db.session.delete(post)
+        TagsModel.adjust_counts(tag_ids, -1)
+        generations = change_tracker.bump("posts", "tags", "comments")
         db.session.commit()
 
+        tag_index.update(TagsModel.find_all(tag_ids).values(), generations["tags"])
+        reference_data.invalidate()
+
         return {
             "message": f"Post {post_id} deleted",
         }
 
+    @change_tracker.conditional("posts", "comments", "tags", "icons", "users")
     @blp.response(200, PostSchema())
     def get(self, post_id):
-        return PostModel.query.get_or_404(post_id)
+        return PostModel.query.options(*PostModel.serialization_options()).get_or_404(post_id)
 
 @blp.route("/search-posts")
 class SearchPosts(MethodView):
     @blp.arguments(SearchPostSchema(), location="json")
     @blp.response(200, PostSchema(many=True))
     def post(self, search_data):
-        posts = PostModel.query
+        posts = PostModel.query.options(*PostModel.serialization_options())
 
         today = date.today()
 
@@ -98,87 +127,142 @@ class SearchPosts(MethodView):
             posts = posts.filter(PostModel.created_at <= date_to)
 
         if search_data.get('tags_ids'):
-            posts = posts.join(PostModel.tags).filter(TagsModel.id.in_(search_data['tags_ids'])).group_by(PostModel.id).having(db.func.count(TagsModel.id) == len(search_data['tags_ids']))
+            posts = posts.filter(PostModel.having_all_tags(search_data['tags_ids']))
 
         if search_data.get('position'):
             lat, lon = search_data['position']['latitude'], search_data['position']['longitude']
-            posts = posts.order_by(PostModel.distance_to(lat, lon))
+            if search_data.get('radius_km'):
+                posts = posts.filter(PostModel.within_radius(lat, lon, search_data['radius_km']))
+            posts, next_cursor = paginate(posts, (PostModel.distance_to(lat, lon), PostModel.id), search_data.get('cursor'), search_data.get('limit'))
+        else:
+            posts, next_cursor = paginate(posts, (PostModel.created_at, PostModel.id), search_data.get('cursor'), search_data.get('limit'), descending=True)
 
-        return posts.all()
+        return posts, 200, cursor_headers(next_cursor)
 
 
 @blp.route("/calendar-preview")
 class PostCalendarPreview(MethodView):
+    @change_tracker.conditional("posts")
+    @blp.arguments(PostCalendarSearchSchema(), location="query")
+    @blp.response(200, PostCalendarPreviewSchema())
+    def get(self, search_data):
+        """Wersja GET z parametrami w adresie, obsługuje If-None-Match"""
+        return calendar_preview(search_data)
+
     @blp.arguments(PostCalendarSearchSchema(), location="json")
     @blp.response(200, PostCalendarPreviewSchema())
     def post(self, search_data):
-        base_date = date(search_data['year'], search_data['month'], 1)
-        offset_months = search_data.get('offset', 0)
-
-        start_date = add_months(base_date, -offset_months)
-
-        end_month_start = add_months(base_date, offset_months + 1)
-        end_date = end_month_start - timedelta(days=1)
-
-        posts = PostModel.query.with_entities(
+        return calendar_preview(search_data)
+
+def calendar_preview(search_data: dict) -> dict:
+    base_date = date(search_data['year'], search_data['month'], 1)
+    offset_months = search_data.get('offset', 0)
+
+    start_date = add_months(base_date, -offset_months)
+
+    end_month_start = add_months(base_date, offset_months + 1)
+    end_date = end_month_start - timedelta(days=1)
+
+    filters_key = (
+        change_tracker.generation("posts"),
+        search_data.get('start_time'),
+        search_data.get('end_time'),
+        tuple(sorted(search_data.get('tags_ids') or ())),
+        search_data.get('counts_only', False),
+        search_data.get('posts_per_day'),
+    )
+
+    months = [add_months(start_date, i) for i in range(2 * offset_months + 1)]
+    rollups = {month: calendar_cache.get((month,) + filters_key) for month in months}
+    missing = [month for month, rollup in rollups.items() if rollup is None]
+
+    if missing:
+        # jedno zapytanie na cały zakres brakujących miesięcy, wynik dzielony na miesiące
+        fetched = fetch_calendar_days(missing[0], add_months(missing[-1], 1), search_data)
+        for month in missing:
+            rollup = {day: data for day, data in fetched.items() if (day.year, day.month) == (month.year, month.month)}
+            calendar_cache.set((month,) + filters_key, rollup)
+            rollups[month] = rollup
+
+    dates = {}
+    for rollup in rollups.values():
+        dates.update(rollup)
+
+    calendar_data = {
+        'meta': {
+            'start_date': start_date,
+            'end_date': end_date,
+            'total_posts': sum(day['count'] for day in dates.values())
+        },
+        'dates': dates
+    }
+
+    return calendar_data
+
+def fetch_calendar_days(start_date: date, end_date: date, search_data: dict) -> dict:
+    """
+    Zwraca {dzień: {'count': ..., 'posts': [...]}} dla postów z przedziału [start_date, end_date).
+    Baza sama grupuje po dniu: przy counts_only zwraca tylko liczniki, a w przeciwnym razie funkcjami okna
+    licznik dnia i jego posty, przy podanym posts_per_day tylko tyle najstarszych, więc wtedy liczba wierszy
+    zależy od liczby dni, nie postów.
+    Filtry godzin działają na wierszach już zawężonych indeksem po created_at.
+    """
+    day = func.date(PostModel.created_at)
+
+    if search_data.get('counts_only'):
+        posts = db.session.query(day.label('day'), func.count(PostModel.id).label('count'))
+    else:
+        posts = db.session.query(
             PostModel.id,
             PostModel.title,
-            PostModel.created_at
-        ).filter(
-            and_(
-                PostModel.created_at >= start_date,
-                PostModel.created_at <= end_date
-            )
+            PostModel.created_at,
+            func.row_number().over(partition_by=day, order_by=(PostModel.created_at, PostModel.id)).label('position'),
+            func.count(PostModel.id).over(partition_by=day).label('count'),
         )
 
-        if search_data.get('start_time'):
-            print(type(search_data['start_time']))
-            posts = posts.filter(
-                func.time(PostModel.created_at) >= search_data['start_time']
-            )
+    posts = posts.filter(
+        and_(
+            PostModel.created_at >= start_date,
+            PostModel.created_at < end_date
+        )
+    )
 
-        if search_data.get('end_time'):
-            posts = posts.filter(
-                func.time(PostModel.created_at) <= search_data['end_time']
-            )
+    if search_data.get('start_time'):
+        posts = posts.filter(
+            func.time(PostModel.created_at) >= search_data['start_time']
+        )
 
-        if search_data.get('tags_ids'):
-            posts = (
-                posts
-                .join(PostModel.tags)
-                .filter(TagsModel.id.in_(search_data['tags_ids']))
-                .group_by(PostModel.id, PostModel.title, PostModel.created_at)
-                .having(func.count(TagsModel.id) == len(search_data['tags_ids']))
-            )
-
-        results = posts.all()
-        posts_by_date = defaultdict(list)
-
-        for post in results:
-
-            date_key = date(post.created_at.year, post.created_at.month, post.created_at.day)
-            posts_by_date[date_key].append({
-                'id': post.id,
-                'title': post.title,
-                'created_at': post.created_at
-            })
-
-        calendar_data = {
-            'meta': {
-                'start_date': start_date,
-                'end_date': end_date,
-                'total_posts': len(results)
-            },
-            'dates': {
-                date: {
-                    'count': len(posts),
-                    'posts': posts
-                }
-                for date, posts in posts_by_date.items()
-            }
+    if search_data.get('end_time'):
+        posts = posts.filter(
+            func.time(PostModel.created_at) <= search_data['end_time']
+        )
+
+    if search_data.get('tags_ids'):
+        posts = posts.filter(PostModel.having_all_tags(search_data['tags_ids']))
+
+    if search_data.get('counts_only'):
+        return {
+            # SQLite zwraca date() jako tekst, Postgres jako date
+            row.day if isinstance(row.day, date) else date.fromisoformat(row.day): {'count': row.count}
+            for row in posts.group_by(day).all()
         }
 
-        return calendar_data
+    ranked = posts.subquery()
+    rows = db.session.query(ranked.c.id, ranked.c.title, ranked.c.created_at, ranked.c.count)
+    if search_data.get('posts_per_day'):
+        rows = rows.filter(ranked.c.position <= search_data['posts_per_day'])
+    rows = rows.order_by(ranked.c.created_at, ranked.c.id)
+
+    posts_by_date = {}
+    for post in rows.all():
+        date_key = date(post.created_at.year, post.created_at.month, post.created_at.day)
+        posts_by_date.setdefault(date_key, {'count': post.count, 'posts': []})['posts'].append({
+            'id': post.id,
+            'title': post.title,
+            'created_at': post.created_at
+        })
+
+    return posts_by_date
 
 def add_months(source_date: date, months: int) -> date:
     """Dodaje lub odejmuje miesiące od daty"""
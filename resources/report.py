@@ -5,7 +5,8 @@ from sqlalchemy.exc import IntegrityError
 
 from db import db
 from models import CommentReportModel, UserModel, CommentModel, PostReportModel, PostModel
-from schemas import CommentReportSchema, PostReportSchema
+from pagination import paginate, cursor_headers
+from schemas import CommentReportSchema, PostReportSchema, PaginationSchema
 
 blp = Blueprint('report', __name__)
 
@@ -13,14 +14,17 @@ blp = Blueprint('report', __name__)
 class Report(MethodView):
 
     @jwt_required()
+    @blp.arguments(PaginationSchema(), location='query')
     @blp.response(200, CommentReportSchema(many=True))
-    def get(self):
+    def get(self, pagination_data):
         user = UserModel.query.get(get_jwt_identity())
 
         if user.is_admin is False and user.is_super_admin is False:
             abort(403, message="You don't have permission to view this endpoint")
 
-        return CommentReportModel.query.all()
+        reports, next_cursor = paginate(CommentReportModel.query, (CommentReportModel.id,), descending=True, **pagination_data)
+
+        return reports, 200, cursor_headers(next_cursor)
 
     @jwt_required()
     @blp.arguments(CommentReportSchema(), location="json")
@@ -47,13 +51,16 @@ class Report(MethodView):
 @blp.route('/posts-reports')
 class PostReport(MethodView):
     @jwt_required()
+    @blp.arguments(PaginationSchema(), location='query')
     @blp.response(200, PostReportSchema(many=True))
-    def get(self):
+    def get(self, pagination_data):
         user = UserModel.query.get(get_jwt_identity())
         if user.is_admin is False and user.is_super_admin is False:
             abort(403, message="You don't have permission to view this endpoint")
 
-        return PostReportModel.query.all()
+        reports, next_cursor = paginate(PostReportModel.query, (PostReportModel.id,), descending=True, **pagination_data)
+
+        return reports, 200, cursor_headers(next_cursor)
 
     @jwt_required()
     @blp.arguments(PostReportSchema(), location="json")
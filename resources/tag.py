@@ -1,16 +1,18 @@
-from functools import reduce
-from operator import or_
-
 from flask_smorest import abort, Blueprint
 from flask.views import MethodView
-from sqlalchemy import func, case, desc, not_
+from sqlalchemy import desc
 
 from db import db
+from generations import change_tracker
 from models import TagsModel
+from reference_data import reference_data
 from schemas import PlainTagSchema, TagSearchSchema
+from tag_index import tag_index
 
 blp = Blueprint('tags', __name__)
 
+tags_schema = PlainTagSchema(many=True)
+
 @blp.route('/tags')
 class Tag(MethodView):
 
@@ -24,60 +26,29 @@ class Tag(MethodView):
         tag = TagsModel(**tag_data)
 
         db.session.add(tag)
+        generations = change_tracker.bump("tags")
         db.session.commit()
 
+        tag_index.update([tag], generations["tags"])
+        reference_data.invalidate()
+
         return tag
 
+    @change_tracker.conditional("tags")
     @blp.arguments(TagSearchSchema(), location='query')
-    @blp.response(200, PlainTagSchema(many=True))
+    @blp.response(200, tags_schema)
     def get(self, tag_data):
         query = tag_data.get('query', '').strip().lower()
         if not query:
-            tags = TagsModel.query
-            if tag_data.get('exclude'):
-                tags = tags.filter(TagsModel.id.notin_(*tag_data['exclude']))
-            return tags.order_by(desc(TagsModel.count)).limit(5).all()
-
-        # Przygotowujemy wariant zapytania bez myślnika
-        query_no_hyphen = query.replace('-', '')
-
-        # Tworzymy wyrażenie CASE do obliczania priorytetu
-        priority = case(
-            (TagsModel.name.ilike(f'{query}'), 12000),
-            # Dokładne dopasowanie na początku (waga: 10000)
-            (TagsModel.name.ilike(f'{query}%'), 10000),
-            # Dopasowanie bez myślników na początku (waga: 8000)
-            (func.replace(TagsModel.name, '-', '').ilike(f'{query_no_hyphen}%'), 8000),
-            # Dopasowanie w środku tekstu (waga: 5000)
-            (TagsModel.name.ilike(f'%{query}%'), 5000),
-            # Dopasowanie w środku bez myślników (waga: 3000)
-            (func.replace(TagsModel.name, '-', '').ilike(f'%{query_no_hyphen}%'), 3000),
-            else_=0
-        )
-
-        # Obliczamy końcowy score uwzględniający zarówno priorytet jak i popularność
-        final_score = priority + func.log(TagsModel.count + 1) * 1000
-
-        # Tworzymy zapytanie z wszystkimi warunkami
-        search_conditions = [
-            TagsModel.name.ilike(f'{query}%'),
-            func.replace(TagsModel.name, '-', '').ilike(f'{query_no_hyphen}%'),
-            TagsModel.name.ilike(f'%{query}%'),
-            func.replace(TagsModel.name, '-', '').ilike(f'%{query_no_hyphen}%')
-        ]
-
-
-        print(search_conditions)
-        final_query = TagsModel.query
-
-        if tag_data.get('exclude'):
-            if len(tag_data['exclude']) > 1:
-                exclude_ids_condition = list(map(lambda id: TagsModel.id == id, tag_data['exclude']))
-                final_query = final_query.filter(not_(reduce(or_, exclude_ids_condition)))
-            else:
-                final_query = final_query.filter(TagsModel.id != tag_data['exclude'][0])
+            exclude = tuple(sorted(tag_data.get('exclude') or ()))
 
+            def load():
+                tags = TagsModel.query
+                if exclude:
+                    tags = tags.filter(TagsModel.id.notin_(exclude))
+                return tags.order_by(desc(TagsModel.count)).limit(5).all()
 
-        final_query = final_query.filter(reduce(or_, search_conditions)).order_by(desc(final_score)).limit(5)
+            return reference_data.response(("top-tags", change_tracker.generation("tags"), exclude), load, tags_schema)
 
-        return final_query.all()
\ No newline at end of file
+        tag_index.sync(change_tracker.generation("tags"))
+        return tag_index.search(query, tag_data.get('exclude', []))
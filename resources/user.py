@@ -1,23 +1,23 @@
 import datetime
-import io
 import re
 from time import sleep
 
-import bcrypt
-import requests
 from flask.views import MethodView
 from flask_jwt_extended import create_access_token, get_jwt_identity, jwt_required, get_jwt
-from flask_mail import Message
 from flask_smorest import Blueprint, abort
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from flask import request, jsonify, url_for, render_template
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
 
 
+from blocklist import token_blocklist
 from db import db
-from mail import mail
+from generations import change_tracker
+from google_tokens import google_tokens
+from http_client import http_client
+from image_jobs import avatar_pipeline
+from mail import mail_queue
 from models import FileModel, UserModel, BlockedTokenModel, PasswordResetModel
+from passwords import password_hasher
 import os
 import magic
 from uuid import uuid4
@@ -64,7 +64,7 @@ class Register(MethodView):
         if not len(user_data["password"]) > 8:
             abort(422, message="Password should contain at least 8 characters")
 
-        user_data["password"] = bcrypt.hashpw(user_data["password"].encode("utf-8"), bcrypt.gensalt(12)).decode("utf-8")
+        user_data["password"] = password_hasher.hash(user_data["password"])
 
         try:
             user = UserModel(**user_data)
@@ -96,9 +96,14 @@ class Login(MethodView):
         if user.password is None:
             abort(401, message="Invalid email or password")
 
-        if not bcrypt.checkpw(login_data["password"].encode("utf-8"), user.password.encode("utf-8")):
+        if not password_hasher.check(login_data["password"], user.password):
             abort(401, message="Invalid email or password")
 
+        # hasło jest jawne tylko w tym momencie, więc tu przeliczamy hash po zmianie BCRYPT_LOG_ROUNDS
+        if password_hasher.needs_rehash(user.password):
+            user.password = password_hasher.hash(login_data["password"])
+            db.session.commit()
+
         token = create_access_token(identity=str(user.id))
         return {
             "token": token
@@ -135,7 +140,7 @@ class GoogleLogin(MethodView):
     @blp.response(200)
     def post(self, google_login_data):
         try:
-            idinfo = id_token.verify_oauth2_token(google_login_data['token'], google_requests.Request(), os.environ.get("GOOGLE_CLIENT_ID"))
+            idinfo = google_tokens.verify(google_login_data['token'], os.environ.get("GOOGLE_CLIENT_ID"))
 
             if idinfo['aud'] not in ALLOWED_GOOGLE_CLIENT_IDS:
                 abort(401, message=f"Invalid client: {idinfo['aud']}")
@@ -167,14 +172,14 @@ class GoogleLogin(MethodView):
                 else:
                     abort(401, message="email exists in database but google account is not verified")
 
-            image = requests.get(idinfo['picture']).content
-
-            image_file = FileModel.save_avatar(io.BytesIO(image))
+            image_file = FileModel.save_remote_avatar(idinfo['picture'])
 
             db.session.add(image_file)
 
             db.session.commit()
 
+            avatar_pipeline.submit(image_file)
+
             user = UserModel(email=idinfo['email'], google_user_id=idinfo['sub'], name=idinfo['given_name'], surname=idinfo['family_name'], avatar_id=image_file.id)
 
             db.session.add(user)
@@ -202,8 +207,7 @@ class GoogleConnect(MethodView):
     @blp.arguments(SocialLoginSchema(), location="json")
     @blp.response(200, description="Google account connected")
     def post(self, google_login_data):
-        idinfo = id_token.verify_oauth2_token(google_login_data['token'], google_requests.Request(),
-                                              os.environ.get("GOOGLE_CLIENT_ID"))
+        idinfo = google_tokens.verify(google_login_data['token'], os.environ.get("GOOGLE_CLIENT_ID"))
 
         if idinfo['aud'] not in ALLOWED_GOOGLE_CLIENT_IDS:
             abort(401, message=f"Invalid client: {idinfo['aud']}")
@@ -250,16 +254,10 @@ class SendResetCode(MethodView):
             reset_code = uuid4()
             code = PasswordResetModel(user_id=user.id, code=str(reset_code))
             db.session.add(code)
+            html = render_template("password_recovery.html", title="Password recovery", reset_code=code.code)
+            mail_queue.enqueue(user_data["email"], "Zresetuj hasło", html)
             db.session.commit()
-            msg = Message(
-                subject="Zresetuj hasło",
-                recipients=[user_data["email"]],
-            )
-            msg.html = render_template("password_recovery.html", title="Password recovery", reset_code=code.code)
-            msg.attach("logo.png", "image/png", open(os.path.join("static", "mails", "logo.png"), 'rb').read(), 'inline', headers={
-                "Content-ID": "<logo>",
-            })
-            mail.send(msg)
+            mail_queue.wake()
         return "sucess", 200
 
 @blp.route("/reset-password")
@@ -307,7 +305,7 @@ class ResetPassword(MethodView):
         if not len(reset_data["new_password"]) >= 8:
             abort(422, message="Password should contain at least 8 characters")
 
-        password = bcrypt.hashpw(reset_data["new_password"].encode("utf-8"), bcrypt.gensalt(12)).decode("utf-8")
+        password = password_hasher.hash(reset_data["new_password"])
 
         user.password = password
 
@@ -323,7 +321,7 @@ class FacebookLogin(MethodView):
     @blp.arguments(SocialLoginSchema(), location="json")
     @blp.response(200)
     def post(self, social_login_data):
-        user_data = requests.get(f"https://graph.facebook.com/v22.0/me?fields=id%2Cfirst_name%2Clast_name%2Cbirthday%2Cemail%2Clocation&access_token={social_login_data['token']}").json()
+        user_data = http_client.get(f"https://graph.facebook.com/v22.0/me?fields=id%2Cfirst_name%2Clast_name%2Cbirthday%2Cemail%2Clocation&access_token={social_login_data['token']}").json()
 
         user = UserModel.query.filter_by(facebook_user_id=user_data['id']).first()
 
@@ -346,13 +344,13 @@ class FacebookLogin(MethodView):
                 "token": token
             }
 
-        profile_pic = requests.get(f"https://graph.facebook.com/v22.0/{user_data['id']}/picture?access_token={social_login_data['token']}")
-
-        avatar = FileModel.save_avatar(io.BytesIO(profile_pic.content))
+        avatar = FileModel.save_remote_avatar(f"https://graph.facebook.com/v22.0/{user_data['id']}/picture?access_token={social_login_data['token']}")
 
         db.session.add(avatar)
         db.session.commit()
 
+        avatar_pipeline.submit(avatar)
+
         user = UserModel(email=user_data['email'], facebook_user_id=user_data['id'], name=user_data['first_name'], surname=user_data['last_name'], avatar_id=avatar.id)
 
         db.session.add(user)
@@ -371,7 +369,7 @@ class FacebookConnect(MethodView):
     @blp.arguments(SocialLoginSchema(), location="json")
     @blp.response(200)
     def post(self, social_login_data):
-        user_data = requests.get(f"https://graph.facebook.com/v22.0/me?fields=id%2Cfirst_name%2Clast_name%2Cbirthday%2Cemail%2Clocation&access_token={social_login_data['token']}").json()
+        user_data = http_client.get(f"https://graph.facebook.com/v22.0/me?fields=id%2Cfirst_name%2Clast_name%2Cbirthday%2Cemail%2Clocation&access_token={social_login_data['token']}").json()
 
         if UserModel.query.filter_by(facebook_user_id=user_data['id']).first() is not None:
             abort(401, message="This facebook account is already linked to other users account")
@@ -422,14 +420,16 @@ class UploadAvatar(MethodView):
             user.avatar_id = image_file.id
 
             # remove file and db file record
-            file_path = os.path.abspath(os.path.join("static/images", old_avatar.filename))
-            os.remove(file_path)
+            old_avatar.remove_files()
             db.session.delete(old_avatar)
 
         user.avatar_id = image_file.id
 
+        change_tracker.bump("users")
         db.session.commit()
 
+        avatar_pipeline.submit(image_file)
+
         return {
             "message": "Avatar uploaded successfully"
         }
@@ -463,9 +463,9 @@ class DeleteProfile(MethodView):
     def delete(self):
         db.session.delete(UserModel.query.get_or_404(get_jwt_identity()))
 
-        blocked_token = BlockedTokenModel(token=get_jwt()['jti'])
-        db.session.add(blocked_token)
+        token_blocklist.block(get_jwt())
 
+        change_tracker.bump("users", "posts", "comments")
         db.session.commit()
 
         return {
@@ -477,8 +477,7 @@ class Logout(MethodView):
     @jwt_required()
     @blp.response(201)
     def post(self):
-        blocked_token = BlockedTokenModel(token=get_jwt()['jti'])
-        db.session.add(blocked_token)
+        token_blocklist.block(get_jwt())
         db.session.commit()
 
         return {
@@ -495,7 +494,7 @@ class ChangePassword(MethodView):
         if user.password is None:
             abort(401, message="Old password did not match")
 
-        if not bcrypt.checkpw(user_data["old_password"].encode("utf-8"), user.password.encode("utf-8")):
+        if not password_hasher.check(user_data["old_password"], user.password):
             abort(401, message="Old password did not match")
 
         capital_regex = re.compile(r"[A-Z]")
@@ -527,7 +526,7 @@ class ChangePassword(MethodView):
         if user_data["new_password"] == user_data["old_password"]:
             abort(400, message="New password can't be the same")
 
-        password_hash = bcrypt.hashpw(user_data["new_password"].encode("utf-8"), bcrypt.gensalt(12)).decode("utf-8")
+        password_hash = password_hasher.hash(user_data["new_password"])
         user.password = password_hash
 
         db.session.commit()
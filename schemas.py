@@ -1,9 +1,45 @@
 import typing
 
+from flask import current_app, has_app_context
 from marshmallow import Schema, fields, post_dump, validates, ValidationError
 
 from enums import ReportType
 from models import PostModel, CommentModel, UserModel
+from serializers import anonymous_author, dump_comment, dump_post, dump_tag
+
+
+class AnonymousAuthorMixin:
+    """Podmienia autora anonimowych obiektów na wspólny anonymous_author()"""
+    anonymous_flag = 'is_anonymous'
+    anonymous_field = 'author'
+
+    @post_dump(pass_original=True)
+    def handle_anonymous(self, data, original, **kwargs):
+        if getattr(original, self.anonymous_flag):
+            data[self.anonymous_field] = anonymous_author()
+        return data
+
+
+class FastDumpMixin:
+    """
+    Przy dump() używa fast_serializer z serializers.py zamiast przechodzić przez pola marshmallow.
+    Działa tylko dla pełnego schematu albo z wykluczonymi polami z fast_excludes, w pozostałych
+    przypadkach (only, zagnieżdżone exclude, FAST_SERIALIZERS=0) wraca do zwykłego dump().
+    Podklasy zmieniające pola muszą ustawić fast_serializer = None.
+    """
+    fast_serializer = None
+    fast_excludes = frozenset()
+
+    def dump(self, obj, *, many=None):
+        enabled = current_app.config.get("FAST_SERIALIZERS", True) if has_app_context() else True
+        if self.fast_serializer is None or not enabled or self.only is not None or not self.exclude <= self.fast_excludes:
+            return super().dump(obj, many=many)
+
+        many = self.many if many is None else many
+        exclude = frozenset(self.exclude)
+        if many:
+            return [self.fast_serializer(item, exclude) for item in obj]
+        return self.fast_serializer(obj, exclude)
 
 
 class PlainUserSchema(Schema):
@@ -37,8 +73,12 @@ class PlainFileSchema(Schema):
     upload_date = fields.DateTime(dump_only=True)
     mime_type = fields.Str(required=True)
     size = fields.Int(required=True)
+    status = fields.Str(dump_only=True, metadata={"description": "processing until avatar variants are generated"})
+    variants = fields.Dict(keys=fields.Str(), values=fields.Str(), dump_only=True)
+
+class PlainTagSchema(FastDumpMixin, Schema):
+    fast_serializer = staticmethod(dump_tag)
 
-class PlainTagSchema(Schema):
     id = fields.Int(dump_only=True)
     name = fields.Str(metadata={"description": "The tags's name"}, required=True)
     count = fields.Int(metadata={"description": "The number of posts this tag was used in"}, dump_only=True)
@@ -88,7 +128,10 @@ class IconSchema(PlainIconSchema):
     file = fields.Nested(PlainFileSchema(), dump_only=True)
 
 
-class PostSchema(PlainPostSchema):
+class PostSchema(FastDumpMixin, AnonymousAuthorMixin, PlainPostSchema):
+    fast_serializer = staticmethod(dump_post)
+    fast_excludes = frozenset({'icon', 'tags', 'author'})
+
     icon = fields.Nested(IconSchema(), dump_only=True)
     icon_id = fields.Int(required=True)
     tags = fields.Nested(PlainTagSchema(), many=True, dump_only=True)
@@ -96,22 +139,6 @@ class PostSchema(PlainPostSchema):
     tags_ids = fields.List(fields.Int(required=True), required=True)
     is_anonymous = fields.Bool(required=True, load_only=True)
 
-    @post_dump(pass_original=True)
-    def handle_anonymous(self, data, original, **kwargs):
-        if original.is_anonymous:
-            data['author'] = {
-            "avatar": {
-                "filename": "default_profile.webp",
-                "id": 1,
-                "mime_type": "image/webp",
-                "size": 2790,
-                "upload_date": "2025-02-23T05:50:54.245560",
-                "url": "https://api.seegest.com/static/images/default_profile.webp"
-            },
-            "name": "Anonimowy"
-        }
-        return data
-
 class PlainReportSchema(Schema):
     id = fields.Int(dump_only=True)
     message = fields.Str(metadata={"description": "The report's message"}, required=True)
@@ -120,12 +147,14 @@ class PlainReportSchema(Schema):
 
 
 class TagSchema(PlainTagSchema):
+    fast_serializer = None
+
     posts = fields.List(fields.Nested(PlainPostSchema), dump_only=True)
 
 class UserSchema(PlainUserSchema):
     avatar_id = fields.Int(load_only=True)
     avatar = fields.Nested(PlainFileSchema(), dump_only=True)
-    posts = fields.Nested(PostSchema(exclude=['author']), many=True, dump_only=True)
+    posts = fields.Nested(PostSchema(exclude=['author']), many=True, dump_only=True, attribute='posts_with_details')
     comments = fields.List(fields.Nested(PlainCommentSchema), dump_only=True)
 
 class LoginSchema(Schema):
@@ -151,7 +180,10 @@ class LocationAutocompleteSchema(Schema):
 class LocationSearchSchema(Schema):
     place_id = fields.Str(required=True)
 
-class CommentSchema(PlainCommentSchema):
+class CommentSchema(FastDumpMixin, AnonymousAuthorMixin, PlainCommentSchema):
+    fast_serializer = staticmethod(dump_comment)
+    fast_excludes = frozenset({'post', 'author', 'parent_comment', 'replies'})
+
     post_id = fields.Int(required=True, load_only=True)
     post = fields.Nested(PlainPostSchema(), dump_only=True)
     author = fields.Nested(UserSchema(only=['avatar', 'name']), dump_only=True)
@@ -160,21 +192,23 @@ class CommentSchema(PlainCommentSchema):
     replies = fields.List(fields.Nested(lambda: CommentSchema(exclude=['post', 'parent_comment', 'replies'])), dump_only=True)
     path = fields.Str(dump_only=True)
 
-    @post_dump(pass_original=True)
-    def handle_anonymous(self, data, original, **kwargs):
-        if original.is_anonymous:
-            data['author'] = {
-                "avatar": {
-                    "filename": "default_profile.webp",
-                    "id": 1,
-                    "mime_type": "image/webp",
-                    "size": 2790,
-                    "upload_date": "2025-02-23T05:50:54.245560",
-                    "url": "https://api.seegest.com/static/images/default_profile.webp"
-                },
-                "name": "Anonimowy"
-            }
-        return data
+class CommentTreeSchema(CommentSchema):
+    fast_serializer = None
+
+    replies = fields.List(
+        fields.Nested(lambda: CommentTreeSchema(exclude=['post', 'parent_comment'])),
+        attribute='thread_replies',
+        dump_only=True,
+    )
+
+class CommentDetailSchema(CommentSchema):
+    fast_serializer = None
+
+    replies = fields.List(
+        fields.Nested(lambda: CommentSchema(exclude=['post', 'parent_comment', 'replies'])),
+        attribute='thread_replies',
+        dump_only=True,
+    )
 
 class ChangePasswordSchema(Schema):
     old_password = fields.Str(required=True)
@@ -191,7 +225,25 @@ class PostReportSchema(PlainReportSchema):
     post = fields.Nested(PostSchema(), dump_only=True)
     user = fields.Nested(UserSchema(exclude=['comments', 'posts']), dump_only=True)
 
-class SearchPostSchema(Schema):
+class PaginationSchema(Schema):
+    cursor = fields.Str(required=False, metadata={"description": "Opaque cursor taken from the X-Next-Cursor header of the previous page"})
+    limit = fields.Int(required=False, metadata={"description": "Page size, capped by the server"})
+
+    @validates('limit')
+    def validate_limit(self, value, **kwargs):
+        if value < 1:
+            raise ValidationError('Limit must be at least 1')
+
+class CommentTreeQuerySchema(PaginationSchema):
+    max_depth = fields.Int(required=False, metadata={"description": "How many levels of replies to return, 1 means top level only"})
+    parent_id = fields.Int(required=False, metadata={"description": "Return the thread below this comment instead of the whole post"})
+
+    @validates('max_depth')
+    def validate_max_depth(self, value, **kwargs):
+        if value < 1:
+            raise ValidationError('Max depth must be at least 1')
+
+class SearchPostSchema(PaginationSchema):
     position = fields.Nested({
         "longitude": fields.Float(required=True),
         "latitude": fields.Float(required=True),
@@ -199,6 +251,12 @@ class SearchPostSchema(Schema):
     date_from = fields.DateTime()
     date_to = fields.DateTime()
     tags_ids = fields.List(fields.Int(required=True), required=False)
+    radius_km = fields.Float(required=False, metadata={"description": "Only return posts within this distance from position"})
+
+    @validates('radius_km')
+    def validate_radius_km(self, value, **kwargs):
+        if value <= 0:
+            raise ValidationError('Radius must be greater than 0')
 
 class PostCalendarSearchSchema(Schema):
     start_time = fields.Time(required=False)
@@ -207,19 +265,26 @@ class PostCalendarSearchSchema(Schema):
     month = fields.Int(required=True)  # 1-12
     year = fields.Int(required=True)
     offset = fields.Int(required=False)  # ile miesięcy w każdą stronę
+    counts_only = fields.Bool(required=False, metadata={"description": "Return only the number of posts per day, without the post lists"})
+    posts_per_day = fields.Int(required=False, metadata={"description": "Maximum number of posts listed for each day (all by default), count is always the full number"})
 
     @validates('month')
-    def validate_month(self, value):
+    def validate_month(self, value, **kwargs):
         if not 1 <= value <= 12:
             raise ValidationError('Month must be between 1 and 12')
 
     @validates('offset')
-    def validate_offset(self, value):
+    def validate_offset(self, value, **kwargs):
         if value < 0:
             raise ValidationError('Offset cannot be negative')
         if value > 12:
             raise ValidationError('Offset cannot be greater than 12 months')
 
+    @validates('posts_per_day')
+    def validate_posts_per_day(self, value, **kwargs):
+        if not 1 <= value <= 100:
+            raise ValidationError('Posts per day must be between 1 and 100')
+
 class PostCalendarPreviewSchema(Schema):
     meta = fields.Nested({
         "end_date": fields.Date(),
@@ -236,19 +301,32 @@ class PostCalendarPreviewSchema(Schema):
     }))
 
 
+class NotificationPostSchema(Schema):
+    """Skrócony post w powiadomieniu, wystarczy do wyświetlenia i linku"""
+    id = fields.Int(dump_only=True)
+    title = fields.Str(dump_only=True)
+
+class NotificationCommentSchema(Schema):
+    """Skrócony komentarz w powiadomieniu, wystarczy do wyświetlenia i linku"""
+    id = fields.Int(dump_only=True)
+    content = fields.Str(dump_only=True)
+    post_id = fields.Int(dump_only=True)
+
+notification_post_schema = NotificationPostSchema()
+notification_comment_schema = NotificationCommentSchema()
+
 class GenericRelationField(fields.Field):
 
     def _serialize(
         self, value: typing.Any, attr: str | None, obj: typing.Any, **kwargs
     ) -> typing.Any:
-        print(value)
         if value is None:
             return None
 
         if isinstance(value, PostModel):
-            return PostSchema().dump(value)
+            return notification_post_schema.dump(value)
         elif isinstance(value, CommentModel):
-            return CommentSchema().dump(value)
+            return notification_comment_schema.dump(value)
 
         raise ValueError("Unsupported type")
 
@@ -258,28 +336,15 @@ class PlainNotificationSchema(Schema):
     created_at = fields.DateTime(metadata={"description": "The notification's creation time."}, dump_only=True)
     is_read = fields.Bool(dump_only=True)
 
-class NotificationSchema(PlainNotificationSchema):
+class NotificationSchema(AnonymousAuthorMixin, PlainNotificationSchema):
+    anonymous_flag = 'is_responder_anonymous'
+    anonymous_field = 'responder'
+
     responder = fields.Nested(UserSchema(only=['avatar', 'name']), dump_only=True)
     subject_type = fields.Str(required=True)
     subject_id = fields.Int(required=True)
     subject = GenericRelationField(required=True)
 
-    @post_dump(pass_original=True)
-    def handle_anonymous(self, data, original, **kwargs):
-        if original.is_responder_anonymous:
-            data['responder'] = {
-                "avatar": {
-                    "filename": "default_profile.webp",
-                    "id": 1,
-                    "mime_type": "image/webp",
-                    "size": 2790,
-                    "upload_date": "2025-02-23T05:50:54.245560",
-                    "url": "https://api.seegest.com/static/images/default_profile.webp"
-                },
-                "name": "Anonimowy"
-            }
-        return data
-
 class DecodeLocationSchema(Schema):
     longitude = fields.Float(required=True)
     latitude = fields.Float(required=True)
@@ -0,0 +1,150 @@
+import heapq
+import threading
+import time
+from collections import defaultdict, namedtuple
+from math import log10
+
+from db import db
+from models import TagsModel
+
+TagEntry = namedtuple('TagEntry', ['id', 'name', 'count'])
+
+# n-gramy do 3 znaków, krótsze zapytania trafiają wprost w zbiór, dłuższe w przecięcie trigramów
+MAX_GRAM = 3
+
+
+def normalize(name: str) -> tuple[str, str]:
+    lowered = name.lower()
+    return lowered, lowered.replace('-', '')
+
+
+def grams(text: str):
+    for size in range(1, MAX_GRAM + 1):
+        for start in range(len(text) - size + 1):
+            yield text[start:start + size]
+
+
+class TagIndex:
+    """
+    Indeks nazw tagów w pamięci procesu do podpowiedzi. Odtwarza punktację z zapytania SQL
+    (progi priorytetu + log10(count + 1) * 1000), ale bez skanowania tabeli przy każdym znaku.
+
+    Zmiany z tego procesu są nanoszone od razu przez update() razem z generacją tagów z bump(),
+    więc sync() przeładowuje indeks tylko po zmianach z innych procesów, a najpóźniej po TAG_INDEX_TTL sekundach.
+    """
+
+    def __init__(self, app=None):
+        self.ttl = 300
+        self._entries = {}
+        self._grams = defaultdict(set)
+        self._loaded_at = None
+        self._generation = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get("TAG_INDEX_TTL", 300)
+        app.extensions["tag_index"] = self
+
+    def sync(self, generation: int):
+        """Wymusza przeładowanie, jeśli tagi zmieniły się od ostatniego wywołania i nie naniósł tego update()"""
+        if generation != self._generation:
+            self._generation = generation
+            self._loaded_at = None
+
+    def update(self, tags, generation: int):
+        """
+        Nanosi tagi zapisane w tym procesie (dodane albo ze zmienionym licznikiem) pod generacją z bump().
+        Jeśli indeks nie odpowiadał generacji tuż sprzed tego zapisu, czyli wcześniej był zapis z innego procesu,
+        nic nie robimy i przeładowanie zostaje dla sync().
+        """
+        with self._lock:
+            if self._loaded_at is None or self._generation != generation - 1:
+                return
+            for tag in tags:
+                self._add(TagEntry(tag.id, tag.name, tag.count))
+            self._generation = generation
+
+    def search(self, query: str, exclude=(), limit: int = 5) -> list[TagEntry]:
+        self._ensure_loaded()
+
+        query, query_no_hyphen = normalize(query)
+        excluded = set()
+        for tag_id in exclude:
+            try:
+                excluded.add(int(tag_id))
+            except (TypeError, ValueError):
+                continue
+
+        with self._lock:
+            candidates = [self._entries[tag_id] for tag_id in self._candidates(query_no_hyphen) if tag_id not in excluded]
+
+        scored = []
+        for entry in candidates:
+            priority = self._priority(entry, query, query_no_hyphen)
+            if priority:
+                scored.append((priority + log10(entry.count + 1) * 1000, -entry.id, entry))
+
+        return [entry for _, _, entry in heapq.nlargest(limit, scored)]
+
+    def _candidates(self, query_no_hyphen: str) -> set:
+        if not query_no_hyphen:
+            return set(self._entries)
+
+        if len(query_no_hyphen) <= MAX_GRAM:
+            return set(self._grams.get(query_no_hyphen, ()))
+
+        trigrams = {query_no_hyphen[start:start + MAX_GRAM] for start in range(len(query_no_hyphen) - MAX_GRAM + 1)}
+        candidates = set.intersection(*[self._grams.get(trigram, set()) for trigram in trigrams])
+        return {tag_id for tag_id in candidates if query_no_hyphen in normalize(self._entries[tag_id].name)[1]}
+
+    @staticmethod
+    def _priority(entry: TagEntry, query: str, query_no_hyphen: str) -> int:
+        name, name_no_hyphen = normalize(entry.name)
+
+        if name == query:
+            return 12000
+        # Dokładne dopasowanie na początku
+        if name.startswith(query):
+            return 10000
+        # Dopasowanie bez myślników na początku
+        if name_no_hyphen.startswith(query_no_hyphen):
+            return 8000
+        # Dopasowanie w środku tekstu
+        if query in name:
+            return 5000
+        # Dopasowanie w środku bez myślników
+        if query_no_hyphen in name_no_hyphen:
+            return 3000
+        return 0
+
+    def _ensure_loaded(self):
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return
+
+        rows = db.session.query(TagsModel.id, TagsModel.name, TagsModel.count).all()
+
+        with self._lock:
+            self._entries = {}
+            self._grams = defaultdict(set)
+            for row in rows:
+                self._add(TagEntry(row.id, row.name, row.count))
+            self._loaded_at = time.monotonic()
+
+    def _add(self, entry: TagEntry):
+        previous = self._entries.get(entry.id)
+        self._entries[entry.id] = entry
+
+        if previous is not None and previous.name == entry.name:
+            return
+
+        if previous is not None:
+            for gram in grams(normalize(previous.name)[1]):
+                self._grams[gram].discard(entry.id)
+
+        for gram in grams(normalize(entry.name)[1]):
+            self._grams[gram].add(entry.id)
+
+
+tag_index = TagIndex()